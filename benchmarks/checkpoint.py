@@ -0,0 +1,66 @@
+"""
+Сравнение времени блокировки цикла событий при синхронном сохранении
+данных и при сохранении контрольной точки дочерним процессом
+
+python3 benchmarks/checkpoint.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import Message, Server, User  # noqa: E402
+
+USERS_NUM = 1_000
+PUBLIC_MESSAGES_NUM = 200_000
+PRIVATE_MESSAGES_NUM = 200_000
+
+
+def make_server(checkpoint_dir: str) -> Server:
+    server = Server(checkpoint_dir=checkpoint_dir)
+    server.users = {
+        f'user{i}': User(name=f'user{i}') for i in range(USERS_NUM)
+    }
+    for i in range(PUBLIC_MESSAGES_NUM):
+        message = Message(
+            sender=f'user{i % USERS_NUM}',
+            text=f'public message {i}',
+            create_at=time.time(),
+            id=server._next_message_id(),
+        )
+        server.public_messages.append(message)
+    for i in range(PRIVATE_MESSAGES_NUM):
+        recipient = f'user{(i * 7) % USERS_NUM}'
+        message = Message(
+            sender=f'user{i % USERS_NUM}',
+            recipient=recipient,
+            text=f'private message {i}',
+            create_at=time.time(),
+            id=server._next_message_id(),
+        )
+        server.private_messages[recipient].append(message)
+    return server
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = make_server(tmp_dir)
+
+        start = time.perf_counter()
+        server._dump_state(os.path.join(tmp_dir, 'sync.pickle'))
+        print(f'sync save: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+        start = time.perf_counter()
+        stall = await server._checkpoint()
+        total = time.perf_counter() - start
+        print(
+            f'checkpoint: event loop stall {stall * 1000:.1f} ms, '
+            f'total {total * 1000:.1f} ms'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
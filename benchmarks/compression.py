@@ -0,0 +1,77 @@
+"""
+Сравнение объёма передаваемых данных и затрат CPU на сжатие
+при отправке повторов истории и коротких интерактивных сообщений
+
+python3 benchmarks/compression.py
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import CompressedWriter, FrameDecoder  # noqa: E402
+from server import Message, Server  # noqa: E402
+
+USERS_NUM = 50
+REPLAY_MESSAGES_NUM = 10_000
+INTERACTIVE_MESSAGES_NUM = 10_000
+
+
+def make_replay() -> bytes:
+    messages = (
+        Message(
+            sender=f'user{i % USERS_NUM}',
+            recipient=f'user{(i * 7) % USERS_NUM}',
+            text=f'Message number {i} about the release schedule',
+            create_at=time.time(),
+            id=i,
+        )
+        for i in range(REPLAY_MESSAGES_NUM)
+    )
+    return ''.join(map(Server._format_message, messages)).encode()
+
+
+def measure(chunks: list[bytes]) -> tuple[int, int, float, float]:
+    """
+    Возвращает (байт без сжатия, байт на проводе, CPU сжатия, CPU разбора)
+    """
+    frames: list[bytes] = []
+    writer = CompressedWriter(SimpleNamespace(write=frames.append))
+    start = time.process_time()
+    for chunk in chunks:
+        writer.write(chunk)
+    compress_time = time.process_time() - start
+
+    wire = b''.join(frames)
+    start = time.process_time()
+    decoded = b''.join(FrameDecoder().feed(wire))
+    decompress_time = time.process_time() - start
+    assert decoded == b''.join(chunks)
+    return len(decoded), len(wire), compress_time, decompress_time
+
+
+def report(name: str, chunks: list[bytes]) -> None:
+    raw, wire, compress_time, decompress_time = measure(chunks)
+    print(
+        f'{name}: raw {raw} B, wire {wire} B '
+        f'({wire / raw:.1%}), compress {compress_time * 1000:.1f} ms, '
+        f'decompress {decompress_time * 1000:.1f} ms'
+    )
+
+
+def main() -> None:
+    replay = make_replay()
+    report('login replay', [replay])
+    interactive = [
+        Server._format_message(
+            Message(sender='user1', text=f'hi {i}', create_at=0, id=i)
+        ).encode()
+        for i in range(INTERACTIVE_MESSAGES_NUM)
+    ]
+    report('interactive', interactive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Накладные расходы на разбор и диспетчеризацию команд.
+
+dispatch - от строки команды до вызова обработчика (обработчики заменены
+пустыми): реестр команд с разбором из байтов и проверками против прежней
+схемы (декодирование строки, match по имени, повторное разбиение
+аргументов и проверки в каждом обработчике).
+end-to-end - полная обработка команд сессии из входного потока.
+
+python3 benchmarks/dispatch.py
+"""
+import asyncio
+import dataclasses
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import logger  # noqa: E402
+from server import Server, Session, User  # noqa: E402
+
+COMMANDS_NUM = 50_000
+REPEAT_NUM = 5
+SESSION_ID = ('127.0.0.1', 12345)
+SCENARIOS = {
+    'send': b'send:c1 user2 hello there',
+    'send 1 KB': b'send:c1 user2 ' + b'x' * 1000,
+    'history': b'history user2 limit 1',
+    'ban': b'ban user2',
+}
+
+
+class NullWriter:
+    """
+    Writer без вывода
+    """
+
+    def __init__(self) -> None:
+        self._closing = False
+
+    def get_extra_info(self, name: str) -> tuple:
+        return SESSION_ID
+
+    def write(self, data: bytes) -> None:
+        pass
+
+    async def drain(self) -> None:
+        pass
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self) -> None:
+        self._closing = True
+
+
+def make_server() -> Server:
+    server = Server(inbox_max_messages=COMMANDS_NUM + 1)
+    server.users = {
+        'user1': User(name='user1'),
+        'user2': User(name='user2', exit_time=0),
+    }
+    server._sessions[SESSION_ID] = Session(NullWriter(), 'user1')
+    return server
+
+
+async def noop(*args) -> None:
+    pass
+
+
+async def legacy_command(server: Server, data: bytes) -> None:
+    """
+    Прежняя схема: строка декодируется и разбивается, выбор обработчика
+    через match, каждый обработчик сам проверяет вход и бан и заново
+    разбивает аргументы
+    """
+    line = data.decode().strip()
+    tokens = line.split(maxsplit=1)
+    command, _, client_id = tokens[0].partition(':')
+    if not server.diagnostics_enabled:
+        await legacy_dispatch(server, command, client_id or None, tokens[1:])
+
+
+async def legacy_dispatch(
+    server: Server, command: str, client_id: str | None, tokens: list[str]
+) -> None:
+    match command:
+        case 'login' | 'send_all':
+            pass
+        case 'send':
+            await legacy_send(server, client_id, tokens)
+        case 'ban':
+            await legacy_ban(server, tokens)
+        case 'history':
+            await legacy_history(server, tokens)
+
+
+async def legacy_is_duplicate(
+    server: Server, user_name: str, client_id: str | None
+) -> bool:
+    if client_id is None:
+        return False
+    return server._dedup.get(user_name, client_id) is not None
+
+
+async def legacy_send(
+    server: Server, client_id: str | None, tokens: list[str]
+) -> None:
+    if not server._is_login(SESSION_ID):
+        return
+    user_name = server._sessions[SESSION_ID].user_name
+    if server._is_ban(user_name):
+        return
+    args = tokens[0] if tokens else ''
+    if await legacy_is_duplicate(server, user_name, client_id):
+        return
+    if not args:
+        return
+    args.split(maxsplit=1)[0]
+    args.split(maxsplit=1)[1:]
+
+
+async def legacy_ban(server: Server, tokens: list[str]) -> None:
+    if not server._is_login(SESSION_ID):
+        return
+    if not tokens:
+        return
+    tokens[0].split(maxsplit=1)[0]
+
+
+async def legacy_history(server: Server, tokens: list[str]) -> None:
+    if not server._is_login(SESSION_ID):
+        return
+    if not tokens:
+        return
+    tokens[0].split()
+
+
+async def measure_dispatch(line: bytes) -> tuple[float, float]:
+    """
+    Лучшее из REPEAT_NUM время диспетчеризации команды по прежней и новой
+    схемам, мкс
+    """
+    server = make_server()
+    server._commands = {
+        name: dataclasses.replace(command, handler=noop)
+        for name, command in server._commands.items()
+    }
+
+    legacy = registry = float('inf')
+    for _ in range(REPEAT_NUM):
+        start = time.perf_counter()
+        for _ in range(COMMANDS_NUM):
+            await legacy_command(server, line)
+        legacy = min(legacy, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(COMMANDS_NUM):
+            await server._command(line.strip(), SESSION_ID)
+        registry = min(registry, time.perf_counter() - start)
+
+    return (
+        legacy / COMMANDS_NUM * 1_000_000,
+        registry / COMMANDS_NUM * 1_000_000,
+    )
+
+
+async def measure_end_to_end(line: bytes) -> float:
+    """
+    Время полной обработки команды из входного потока, мкс
+    """
+    server = make_server()
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'login user1\n' + (line + b'\n') * COMMANDS_NUM)
+    reader.feed_eof()
+
+    start = time.perf_counter()
+    await server._client_handler(reader, NullWriter())
+    return (time.perf_counter() - start) / COMMANDS_NUM * 1_000_000
+
+
+async def main() -> None:
+    logger.setLevel(logging.WARNING)
+    for name, line in SCENARIOS.items():
+        legacy, registry = await measure_dispatch(line)
+        end_to_end = await measure_end_to_end(line)
+        print(
+            f'{name}: dispatch {legacy:.2f} -> {registry:.2f} us/command, '
+            f'end-to-end {end_to_end:.2f} us/command'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,333 @@
+import asyncio
+import re
+import uuid
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from config import logger
+
+MESSAGE_PATTERN = re.compile(
+    r'Id: (?P<id>\d+) From: (?P<sender>\S+) To: (?P<recipient>\S+) '
+    r'Text: (?P<text>.*)'
+)
+ACK_PATTERN = re.compile(r'Ack: (?P<client_id>\S+)(?: Id: (?P<id>\d+))?')
+INCOMING_QUEUE_SIZE = 10_000
+POOL_MAX_CONNECTIONS = 10
+
+
+class CommandError(Exception):
+    """
+    Сервер отклонил команду
+    """
+
+
+@dataclass
+class IncomingMessage:
+    """
+    Полученное сообщение
+    """
+
+    id: int
+    sender: str
+    recipient: str
+    text: str
+
+
+class ChatClient:
+    """
+    Программный асинхронный клиент. Команды отправки не ждут ответа на
+    предыдущие: каждой присваивается идентификатор клиента, по которому
+    сопоставляется подтверждение сервера; ошибки сервер возвращает в
+    порядке получения команд
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        self.host = host
+        self.port = port
+        self.user_name: str | None = None
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._receive_task: asyncio.Task | None = None
+        self._pending: OrderedDict[str, asyncio.Future] = OrderedDict()
+        self._incoming: asyncio.Queue = asyncio.Queue(INCOMING_QUEUE_SIZE)
+
+    async def __aenter__(self) -> 'ChatClient':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def __aiter__(self) -> 'ChatClient':
+        return self
+
+    async def __anext__(self) -> IncomingMessage:
+        message = await self._incoming.get()
+        if message is None:
+            self._incoming.put_nowait(None)
+            raise StopAsyncIteration
+        return message
+
+    @property
+    def is_connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        """
+        Подключение к серверу
+        """
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+        self._receive_task = asyncio.create_task(self._receive())
+
+    async def login(self, user_name: str) -> None:
+        """
+        Вход пользователя. К моменту возврата непрочитанные сообщения уже
+        поступили во входящие
+        """
+        if not user_name or user_name.split()[0] != user_name:
+            raise ValueError(f'Invalid user name: {user_name!r}')
+
+        await self._request('login', user_name)
+        self.user_name = user_name
+
+    async def send(self, user_name: str, text: str) -> int:
+        """
+        Отправка приватного сообщения. Возвращает id сообщения
+        """
+        return await self._request('send', f'{user_name} {text}')
+
+    async def send_all(self, text: str) -> int:
+        """
+        Отправка публичного сообщения. Возвращает id сообщения
+        """
+        return await self._request('send_all', text)
+
+    async def close(self) -> None:
+        """
+        Отключение от сервера
+        """
+        if self.is_connected:
+            await self._write('quit')
+            self._writer.close()
+        if self._receive_task:
+            await asyncio.gather(self._receive_task, return_exceptions=True)
+
+    async def _request(self, command: str, args: str) -> int | None:
+        """
+        Отправка команды с идентификатором клиента и ожидание подтверждения.
+        Возвращает id сообщения из подтверждения
+        """
+        if '\n' in args:
+            raise ValueError('Message text must not contain line breaks')
+
+        client_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[client_id] = future
+        await self._write(f'{command}:{client_id} {args}')
+        return await future
+
+    async def _write(self, line: str) -> None:
+        """
+        Запись команды
+        """
+        if not self.is_connected:
+            raise ConnectionError('Client is not connected')
+
+        self._writer.write(f'{line}\n'.encode())
+        await self._writer.drain()
+
+    async def _receive(self) -> None:
+        """
+        Разбор ответов и входящих сообщений
+        """
+        try:
+            while line := await self._reader.readline():
+                self._dispatch(line.decode().rstrip('\n'))
+        except ConnectionError as error:
+            logger.info(f'Connection lost: {error}')
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(
+                        ConnectionError('Connection closed')
+                    )
+            self._pending.clear()
+            self._put_incoming(None)
+
+    def _dispatch(self, line: str) -> None:
+        """
+        Обработка строки, полученной от сервера
+        """
+        if match := MESSAGE_PATTERN.fullmatch(line):
+            self._put_incoming(
+                IncomingMessage(
+                    id=int(match['id']),
+                    sender=match['sender'],
+                    recipient=match['recipient'],
+                    text=match['text'],
+                )
+            )
+        elif match := ACK_PATTERN.fullmatch(line):
+            future = self._pending.pop(match['client_id'], None)
+            if future and not future.done():
+                future.set_result(match['id'] and int(match['id']))
+        elif self._pending:
+            _, future = self._pending.popitem(last=False)
+            if not future.done():
+                future.set_exception(CommandError(line))
+        elif line:
+            logger.info(f'Unexpected server response: {line}')
+
+    def _put_incoming(self, message: IncomingMessage | None) -> None:
+        """
+        Добавление во входящие; при переполнении вытесняется самое старое
+        """
+        if self._incoming.full():
+            self._incoming.get_nowait()
+            logger.warning('Incoming queue is full, drop oldest message')
+        self._incoming.put_nowait(message)
+
+
+class ChatClientPool:
+    """
+    Пул соединений для множества пользователей: открыто не более
+    max_connections соединений, каждое за своим пользователем. Если
+    свободных соединений не осталось, закрывается давно не использованное
+    соединение, которое сейчас никем не занято.
+
+    Протокол сервера связывает соединение с одним пользователем (login),
+    поэтому пользователи не разделяют соединение: смена пользователя
+    соединения - новый вход с выводом непрочитанных сообщений
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        max_connections: int = POOL_MAX_CONNECTIONS,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self._clients: OrderedDict[str, ChatClient] = OrderedDict()
+        self._connecting: set[str] = set()
+        self._in_use: Counter[str] = Counter()
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def acquire(self, user_name: str) -> AsyncIterator[ChatClient]:
+        """
+        Соединение пользователя; одновременно может использоваться
+        несколькими задачами
+        """
+        client = await self._checkout(user_name)
+        try:
+            yield client
+        finally:
+            await self._release(user_name)
+
+    async def send(self, sender: str, user_name: str, text: str) -> int:
+        """
+        Отправка приватного сообщения от имени sender
+        """
+        async with self.acquire(sender) as client:
+            return await client.send(user_name, text)
+
+    async def send_all(self, sender: str, text: str) -> int:
+        """
+        Отправка публичного сообщения от имени sender
+        """
+        async with self.acquire(sender) as client:
+            return await client.send_all(text)
+
+    async def close(self) -> None:
+        """
+        Закрытие всех соединений
+        """
+        async with self._condition:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        await asyncio.gather(*(client.close() for client in clients))
+
+    async def _checkout(self, user_name: str) -> ChatClient:
+        """
+        Получение соединения пользователя с открытием нового при
+        необходимости. Место в пуле резервируется под блокировкой, а
+        подключение, вход и закрытие вытесненного соединения выполняются
+        вне её
+        """
+        async with self._condition:
+            client, ready, stale = await self._reserve(user_name)
+        if ready:
+            return client
+
+        try:
+            if stale:
+                await stale.close()
+            await client.connect()
+            await client.login(user_name)
+        except BaseException:
+            await client.close()
+            async with self._condition:
+                if self._clients.get(user_name) is client:
+                    del self._clients[user_name]
+            await self._release(user_name)
+            raise
+
+        async with self._condition:
+            self._connecting.discard(user_name)
+            self._condition.notify_all()
+        return client
+
+    async def _reserve(
+        self, user_name: str
+    ) -> tuple[ChatClient, bool, ChatClient | None]:
+        """
+        Резервирование соединения пользователя (вызывается под
+        блокировкой). Возвращает соединение, признак готовности (иначе
+        соединение ещё не подключено) и соединение, которое нужно закрыть
+        """
+        while True:
+            client = self._clients.get(user_name)
+            if user_name in self._connecting:
+                await self._condition.wait()
+                continue
+
+            if client and client.is_connected:
+                self._clients.move_to_end(user_name)
+                self._in_use[user_name] += 1
+                return client, True, None
+
+            stale = client
+            if not client and len(self._clients) >= self.max_connections:
+                idle = next(
+                    (name for name in self._clients if not self._in_use[name]),
+                    None,
+                )
+                if idle is None:
+                    await self._condition.wait()
+                    continue
+                stale = self._clients.pop(idle)
+
+            client = self._clients[user_name] = ChatClient(
+                self.host, self.port
+            )
+            self._clients.move_to_end(user_name)
+            self._connecting.add(user_name)
+            self._in_use[user_name] += 1
+            return client, False, stale
+
+    async def _release(self, user_name: str) -> None:
+        """
+        Освобождение соединения пользователя
+        """
+        async with self._condition:
+            self._connecting.discard(user_name)
+            self._in_use[user_name] -= 1
+            if not self._in_use[user_name]:
+                del self._in_use[user_name]
+            self._condition.notify_all()
@@ -1,17 +1,26 @@
 import asyncio
 import signal
+import sys
 
 from aioconsole import ainput
 
+from compression import COMPRESSION_ACK, COMPRESSION_METHOD, FrameDecoder
 from config import logger
 
 EXIT_COMMAND = 'quit'
 
 
 class Client:
-    def __init__(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        compress: bool = False,
+    ) -> None:
         self.host = host
         self.port = port
+        self.compress = compress
+        self._decoder: FrameDecoder | None = None
         self._reader = None
         self._writer = None
         self._receive_task: asyncio.Task | None = None
@@ -28,21 +37,32 @@ class Client:
         self._reader, self._writer = await asyncio.open_connection(
             self.host, self.port
         )
+        if self.compress:
+            await self._enable_compression()
         self._receive_task = asyncio.create_task(self._receive())
         self._send_task = asyncio.create_task(self._send())
         await self._stop_client_task()
 
+    async def _enable_compression(self) -> None:
+        """
+        Согласование сжатия с сервером
+        """
+        self._writer.write(f'compress {COMPRESSION_METHOD}\n'.encode())
+        await self._writer.drain()
+        response = await self._reader.readuntil(COMPRESSION_ACK.encode())
+        logger.info(f'{response.decode()}')
+        self._decoder = FrameDecoder()
+
     async def _send(self) -> None:
         """
         Отправка
         """
         while True:
             msg: str = await ainput('>')
-            self._writer.write(msg.encode())
+            self._writer.write(f'{msg}\n'.encode())
             await self._writer.drain()
             if msg == EXIT_COMMAND:
                 self._stop_event.set()
-            await asyncio.sleep(0.1)
 
     async def _receive(self) -> None:
         """
@@ -54,7 +74,11 @@ class Client:
                 logger.info('Closed by the server')
                 self._stop_event.set()
                 break
-            logger.info(f'{response.decode()}')
+            if self._decoder:
+                for data in self._decoder.feed(response):
+                    logger.info(f'{data.decode()}')
+            else:
+                logger.info(f'{response.decode()}')
 
     async def _stop_client_task(self) -> None:
         """
@@ -84,5 +108,5 @@ class Client:
 
 
 if __name__ == '__main__':
-    client = Client()
+    client = Client(compress='--compress' in sys.argv)
     asyncio.run(client.run())
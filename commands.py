@@ -0,0 +1,194 @@
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+MIDDLEWARE_LOGIN = 'login'
+MIDDLEWARE_BAN = 'ban'
+MIDDLEWARE_DEDUP = 'dedup'
+MIDDLEWARE_RATE_LIMIT = 'rate_limit'
+MIDDLEWARE_ADMIN = 'admin'
+
+
+@dataclass(slots=True)
+class LoginArgs:
+    """
+    Аргументы команды login
+    """
+
+    user_name: str | None
+    client_id: str | None = None
+
+
+@dataclass(slots=True)
+class SendAllArgs:
+    """
+    Аргументы команды send_all
+    """
+
+    text: str
+    client_id: str | None = None
+
+
+@dataclass(slots=True)
+class SendArgs:
+    """
+    Аргументы команды send
+    """
+
+    recipient: str | None
+    text: str | None
+    client_id: str | None = None
+
+
+@dataclass(slots=True)
+class HistoryArgs:
+    """
+    Аргументы команды history
+    """
+
+    peer: str | None
+    params: list[str]
+
+
+@dataclass(slots=True)
+class SearchArgs:
+    """
+    Аргументы команды search
+    """
+
+    query: str
+
+
+def parse_login(data: bytes) -> LoginArgs:
+    """
+    <name>
+    """
+    return LoginArgs(parse_name(data))
+
+
+def parse_send_all(data: bytes) -> SendAllArgs:
+    """
+    <message>
+    """
+    return SendAllArgs(data.lstrip().decode())
+
+
+def parse_send(data: bytes) -> SendArgs:
+    """
+    <username> <message>
+    """
+    words = data.split(None, 1)
+    return SendArgs(
+        words[0].decode() if words else None,
+        words[1].decode() if len(words) > 1 else None,
+    )
+
+
+def parse_name(data: bytes) -> str | None:
+    """
+    <name> - единственный аргумент команд ban, compress, profile
+    """
+    parts = data.split(None, 1)
+    return parts[0].decode() if parts else None
+
+
+def parse_history(data: bytes) -> HistoryArgs:
+    """
+    <all|username> [<параметр> <значение> ...]
+    """
+    words = data.decode().split()
+    return HistoryArgs(words[0] if words else None, words[1:])
+
+
+def parse_search(data: bytes) -> SearchArgs:
+    """
+    <query>
+    """
+    return SearchArgs(data.decode())
+
+
+@dataclass(frozen=True, slots=True)
+class Command:
+    """
+    Описание команды: метод-обработчик, разбор аргументов из байтов
+    строки и проверки (middleware), выполняемые до обработчика. Проверка
+    _check_<имя> возвращает ответ, прерывающий выполнение команды;
+    проверка входа (MIDDLEWARE_LOGIN) выполняется сервером до разбора
+    аргументов без вызова метода.
+    client_id - команда принимает идентификатор сообщения клиента
+    (<command>:<client_id>) в поле client_id аргументов
+    """
+
+    name: str
+    handler: str
+    parser: Callable[[bytes], Any] | None = None
+    middleware: tuple[str, ...] = ()
+    client_id: bool = False
+
+    def bind(self, server: Any) -> 'BoundCommand':
+        """
+        Связывание обработчика и проверок с методами сервера
+        """
+        return BoundCommand(
+            name=self.name,
+            handler=getattr(server, self.handler),
+            parser=self.parser,
+            checks=tuple(
+                getattr(server, f'_check_{name}')
+                for name in self.middleware
+                if name != MIDDLEWARE_LOGIN
+            ),
+            login=MIDDLEWARE_LOGIN in self.middleware,
+            client_id=self.client_id,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class BoundCommand:
+    """
+    Команда со связанными методами сервера
+    """
+
+    name: str
+    handler: Callable[..., Awaitable[None]]
+    parser: Callable[[bytes], Any] | None
+    checks: tuple[Callable[[Any, Any], str | None], ...]
+    login: bool
+    client_id: bool
+
+
+COMMANDS = (
+    Command('login', '_command_login', parse_login, client_id=True),
+    Command(
+        'send_all',
+        '_command_send_all',
+        parse_send_all,
+        (
+            MIDDLEWARE_LOGIN,
+            MIDDLEWARE_BAN,
+            MIDDLEWARE_DEDUP,
+            MIDDLEWARE_RATE_LIMIT,
+        ),
+        client_id=True,
+    ),
+    Command(
+        'send',
+        '_command_send_user',
+        parse_send,
+        (MIDDLEWARE_LOGIN, MIDDLEWARE_BAN, MIDDLEWARE_DEDUP),
+        client_id=True,
+    ),
+    Command('ban', '_command_ban_user', parse_name, (MIDDLEWARE_LOGIN,)),
+    Command(
+        'history', '_command_history', parse_history, (MIDDLEWARE_LOGIN,)
+    ),
+    Command('search', '_command_search', parse_search, (MIDDLEWARE_LOGIN,)),
+    Command('unread', '_command_unread', middleware=(MIDDLEWARE_LOGIN,)),
+    Command('compress', '_command_compress', parse_name),
+    Command('stats', '_command_stats', middleware=(MIDDLEWARE_ADMIN,)),
+    Command(
+        'profile', '_command_profile', parse_name, (MIDDLEWARE_ADMIN,)
+    ),
+    Command('memory', '_command_memory', middleware=(MIDDLEWARE_ADMIN,)),
+    Command('quit', '_command_quit'),
+)
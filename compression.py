@@ -0,0 +1,120 @@
+import zlib
+from asyncio.streams import StreamWriter
+from collections.abc import Iterator
+
+COMPRESSION_METHOD = 'zlib'
+COMPRESSION_ACK = f'Compression: {COMPRESSION_METHOD}\n'
+COMPRESS_THRESHOLD_BYTES = 1024
+FRAME_DEFLATE = 0
+FRAME_RAW = 1
+LINE_END = b'\n'
+
+
+def frame_header(kind: int, size: int) -> bytes:
+    """
+    Заголовок кадра: байт типа и длина данных (varint, по 7 бит в байте)
+    """
+    header = bytearray((kind,))
+    while size >= 0x80:
+        header.append(size & 0x7F | 0x80)
+        size >>= 7
+    header.append(size)
+    return bytes(header)
+
+
+def parse_frame_header(data: bytes | bytearray) -> tuple[int, int, int] | None:
+    """
+    Разбор заголовка кадра: (тип, длина данных, размер заголовка) или None,
+    если заголовок получен не полностью
+    """
+    size = shift = 0
+    for i in range(1, len(data)):
+        size |= (data[i] & 0x7F) << shift
+        if data[i] < 0x80:
+            return data[0], size, i + 1
+        shift += 7
+    return None
+
+
+def is_plain(data: bytes) -> bool:
+    """
+    Данные из целых строк, ни одна из которых не начинается с байта типа
+    кадра, передаются без заголовка
+    """
+    return (
+        data.endswith(LINE_END)
+        and data[0] > FRAME_RAW
+        and b'\n\x00' not in data
+        and b'\n\x01' not in data
+    )
+
+
+class CompressedWriter:
+    """
+    Обёртка StreamWriter для соединения с согласованным сжатием.
+    Записи от threshold байт сжимаются общим для соединения контекстом
+    zlib и передаются кадром (тип, длина, данные); короткие текстовые
+    ответы передаются строками без заголовка
+    """
+
+    def __init__(
+        self,
+        writer: StreamWriter,
+        threshold: int = COMPRESS_THRESHOLD_BYTES,
+    ) -> None:
+        self._writer = writer
+        self._threshold = threshold
+        self._compressor = zlib.compressobj()
+
+    def __getattr__(self, name: str):
+        return getattr(self._writer, name)
+
+    def write(self, data: bytes) -> None:
+        """
+        Запись строк или кадра
+        """
+        if len(data) >= self._threshold:
+            data = self._compressor.compress(
+                data
+            ) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._writer.write(frame_header(FRAME_DEFLATE, len(data)) + data)
+        elif is_plain(data):
+            self._writer.write(data)
+        else:
+            self._writer.write(frame_header(FRAME_RAW, len(data)) + data)
+
+
+class FrameDecoder:
+    """
+    Разбор данных, записанных CompressedWriter
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._decompressor = zlib.decompressobj()
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """
+        Добавление полученных данных и выдача всех полных строк и кадров
+        """
+        self._buffer += data
+        while self._buffer:
+            if self._buffer[0] > FRAME_RAW:
+                end = self._buffer.find(LINE_END) + 1
+                if not end:
+                    break
+                yield bytes(self._buffer[:end])
+                del self._buffer[:end]
+                continue
+
+            header = parse_frame_header(self._buffer)
+            if header is None:
+                break
+            kind, size, start = header
+            if len(self._buffer) < start + size:
+                break
+            payload = bytes(self._buffer[start:start + size])
+            del self._buffer[:start + size]
+            if kind == FRAME_DEFLATE:
+                payload = self._decompressor.decompress(payload)
+            yield payload
@@ -0,0 +1,88 @@
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from operator import attrgetter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from server import Message
+
+
+class ConversationIndex:
+    """
+    Приватные сообщения по парам (отправитель, получатель): упорядоченные
+    по id списки для выборки диапазонов бинарным поиском и счётчики
+    непрочитанных сообщений. Сообщения из хранилища входящих на диске
+    учитываются только в счётчиках
+    """
+
+    def __init__(self) -> None:
+        self._messages: dict[tuple[str, str], list['Message']] = {}
+        self._unread: defaultdict[str, Counter[str]] = defaultdict(Counter)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._messages.values()))
+
+    def add(self, message: 'Message', stored: bool = True) -> None:
+        """
+        Учёт нового сообщения. stored=False - сообщение хранится на диске
+        """
+        if not message.read_time:
+            self._unread[message.sender][message.recipient] += 1
+        if stored:
+            self.store(message)
+
+    def store(self, message: 'Message') -> None:
+        """
+        Добавление уже учтённого сообщения в список переписки
+        """
+        messages = self._messages.setdefault(
+            (message.sender, message.recipient), []
+        )
+        if not messages or messages[-1].id < message.id:
+            messages.append(message)
+        else:
+            insort(messages, message, key=attrgetter('id'))
+
+    def mark_read(self, message: 'Message') -> None:
+        """
+        Учёт прочтения сообщения
+        """
+        self._decrement_unread(message.sender, message.recipient)
+
+    def remove(self, message: 'Message') -> None:
+        """
+        Удаление сообщения
+        """
+        if not message.read_time:
+            self._decrement_unread(message.sender, message.recipient)
+
+        pair = (message.sender, message.recipient)
+        messages = self._messages.get(pair)
+        if not messages:
+            return
+
+        i = bisect_left(messages, message.id, key=attrgetter('id'))
+        if i < len(messages) and messages[i] is message:
+            del messages[i]
+        if not messages:
+            del self._messages[pair]
+
+    def messages(self, sender: str, recipient: str) -> list['Message']:
+        """
+        Упорядоченные по id сообщения от sender к recipient
+        """
+        return self._messages.get((sender, recipient), [])
+
+    def unread(self, sender: str) -> dict[str, int]:
+        """
+        Количество непрочитанных сообщений отправителя по получателям
+        """
+        return dict(self._unread.get(sender, {}))
+
+    def _decrement_unread(self, sender: str, recipient: str) -> None:
+        counter = self._unread[sender]
+        counter[recipient] -= 1
+        if counter[recipient] <= 0:
+            del counter[recipient]
+        if not counter:
+            del self._unread[sender]
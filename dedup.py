@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+
+CLIENT_ID_SEPARATOR = b':'
+DEDUP_WINDOW_SIZE = 1000
+DEDUP_TTL_SEC = 5 * 60
+
+
+class DedupWindow:
+    """
+    Окно последних идентификаторов сообщений каждого отправителя:
+    не более size записей (вытесняются давно использованные), каждая
+    действует ttl_sec секунд
+    """
+
+    def __init__(
+        self, size: int = DEDUP_WINDOW_SIZE, ttl_sec: float = DEDUP_TTL_SEC
+    ) -> None:
+        self.size = size
+        self.ttl_sec = ttl_sec
+        self._entries: dict[str, OrderedDict[str, tuple[int, float]]] = {}
+
+    def get(self, sender: str, client_id: str) -> int | None:
+        """
+        Идентификатор сообщения, ранее сохранённого с client_id
+        """
+        entries = self._entries.get(sender)
+        if not entries or client_id not in entries:
+            return None
+
+        message_id, create_at = entries[client_id]
+        if create_at + self.ttl_sec < time.time():
+            del entries[client_id]
+            return None
+
+        entries.move_to_end(client_id)
+        return message_id
+
+    def add(self, sender: str, client_id: str, message_id: int) -> None:
+        """
+        Запоминание сохранённого сообщения
+        """
+        entries = self._entries.setdefault(sender, OrderedDict())
+        entries[client_id] = (message_id, time.time())
+        entries.move_to_end(client_id)
+        while len(entries) > self.size:
+            entries.popitem(last=False)
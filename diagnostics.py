@@ -0,0 +1,275 @@
+import asyncio
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from threading import Event, Thread
+from weakref import WeakKeyDictionary
+
+from config import logger
+
+LAG_INTERVAL_SEC = 0.5
+SLOW_THRESHOLD_SEC = 0.1
+PROFILE_INTERVAL_SEC = 0.005
+PROFILE_FILE = 'profile_stats.txt'
+PROFILE_TOP_NUM = 50
+
+# Замер обратных вызовов опирается на внутреннее устройство asyncio.Handle
+# в CPython; при его отсутствии остаётся только монитор задержки цикла
+SLOW_CALLBACKS_SUPPORTED = (
+    sys.implementation.name == 'cpython'
+    and callable(getattr(asyncio.Handle, '_run', None))
+    and {'_loop', '_callback'} <= set(asyncio.Handle.__slots__)
+)
+_handle_run = getattr(asyncio.Handle, '_run', None)
+_slow_callback_loops: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, list['Diagnostics']
+] = WeakKeyDictionary()
+
+
+def _timed_handle_run(handle: asyncio.Handle) -> None:
+    """
+    Выполнение обратного вызова с замером времени для циклов событий
+    с включёнными предупреждениями
+    """
+    diagnostics = _slow_callback_loops.get(handle._loop)
+    if not diagnostics:
+        _handle_run(handle)
+        return
+
+    start = time.perf_counter()
+    _handle_run(handle)
+    duration_sec = time.perf_counter() - start
+    for item in diagnostics:
+        item.check_callback(handle, duration_sec)
+
+
+@dataclass
+class CommandStats:
+    """
+    Статистика выполнения команды
+    """
+
+    count: int = 0
+    total_sec: float = 0.0
+    max_sec: float = 0.0
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик: фоновый поток периодически снимает стек
+    потока цикла событий и подсчитывает попадания в функции
+    """
+
+    def __init__(
+        self, thread_id: int, interval_sec: float = PROFILE_INTERVAL_SEC
+    ) -> None:
+        self.thread_id = thread_id
+        self.interval_sec = interval_sec
+        self.samples_num = 0
+        self._own: Counter[tuple] = Counter()
+        self._total: Counter[tuple] = Counter()
+        self._stop_event = Event()
+        self._thread = Thread(target=self._sample, daemon=True)
+
+    def start(self) -> None:
+        """
+        Запуск сбора
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Остановка сбора
+        """
+        self._stop_event.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        """
+        Сбор стеков
+        """
+        while not self._stop_event.wait(self.interval_sec):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            self.samples_num += 1
+            self._own[self._location(frame)] += 1
+            seen = set()
+            while frame is not None:
+                location = self._location(frame)
+                if location not in seen:
+                    seen.add(location)
+                    self._total[location] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def _location(frame) -> tuple:
+        code = frame.f_code
+        return code.co_filename, code.co_firstlineno, code.co_name
+
+    def dump(self, path: str) -> None:
+        """
+        Запись статистики в файл
+        """
+        with open(path, 'w') as file:
+            file.write(f'Samples: {self.samples_num}\n')
+            file.write(f'{"own":>8} {"total":>8}  function\n')
+            for location, total in self._total.most_common(PROFILE_TOP_NUM):
+                filename, line, name = location
+                file.write(
+                    f'{self._own[location]:>8} {total:>8}  '
+                    f'{name} ({filename}:{line})\n'
+                )
+
+
+class Diagnostics:
+    """
+    Диагностика сервера: задержка цикла событий, время выполнения команд,
+    сообщения о медленных обработчиках и профилирование
+    """
+
+    def __init__(
+        self,
+        slow_threshold_sec: float = SLOW_THRESHOLD_SEC,
+        lag_interval_sec: float = LAG_INTERVAL_SEC,
+        profile_file: str = PROFILE_FILE,
+    ) -> None:
+        self.slow_threshold_sec = slow_threshold_sec
+        self.lag_interval_sec = lag_interval_sec
+        self.profile_file = profile_file
+        self.lag_last_sec = 0.0
+        self.lag_max_sec = 0.0
+        self.command_stats: dict[str, CommandStats] = {}
+        self._profiler: SamplingProfiler | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def enable_slow_callbacks(self) -> None:
+        """
+        Предупреждения об обратных вызовах текущего цикла событий дольше
+        slow_threshold_sec. Время замеряется обёрткой Handle._run только
+        для циклов, где предупреждения включены: отладочный режим asyncio
+        замедляет весь цикл и не включается
+        """
+        if not SLOW_CALLBACKS_SUPPORTED:
+            logger.warning('Slow callback reports are not supported')
+            return
+
+        loop = asyncio.get_running_loop()
+        _slow_callback_loops.setdefault(loop, []).append(self)
+        self._loop = loop
+        asyncio.Handle._run = _timed_handle_run
+
+    def disable_slow_callbacks(self) -> None:
+        """
+        Отключение предупреждений; обёртка снимается, когда они отключены
+        во всех циклах
+        """
+        if self._loop is None:
+            return
+
+        diagnostics = _slow_callback_loops.get(self._loop, [])
+        if self in diagnostics:
+            diagnostics.remove(self)
+        if not diagnostics:
+            _slow_callback_loops.pop(self._loop, None)
+        if not _slow_callback_loops:
+            asyncio.Handle._run = _handle_run
+        self._loop = None
+
+    def check_callback(
+        self, handle: asyncio.Handle, duration_sec: float
+    ) -> None:
+        """
+        Предупреждение о медленном обратном вызове
+        """
+        if duration_sec > self.slow_threshold_sec:
+            logger.warning(
+                f'Slow callback {self._format_handle(handle)}: '
+                f'{duration_sec * 1000:.1f} ms'
+            )
+
+    @staticmethod
+    def _format_handle(handle: asyncio.Handle) -> str:
+        """
+        Представление обратного вызова: для шага задачи - задача
+        """
+        task = getattr(handle._callback, '__self__', None)
+        if isinstance(task, asyncio.Task):
+            return repr(task)
+        return repr(handle)
+
+    async def monitor_lag(self) -> None:
+        """
+        Измерение задержки планирования цикла событий
+        """
+        logger.info('Start event loop lag monitor task')
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval_sec)
+            lag = loop.time() - start - self.lag_interval_sec
+            self.lag_last_sec = lag
+            self.lag_max_sec = max(self.lag_max_sec, lag)
+            if lag > self.slow_threshold_sec:
+                logger.warning(f'Event loop lag {lag * 1000:.1f} ms')
+
+    def record_command(self, command: str, duration_sec: float) -> None:
+        """
+        Учёт времени выполнения команды
+        """
+        stats = self.command_stats.get(command)
+        if stats is None:
+            stats = self.command_stats[command] = CommandStats()
+        stats.count += 1
+        stats.total_sec += duration_sec
+        stats.max_sec = max(stats.max_sec, duration_sec)
+        if duration_sec > self.slow_threshold_sec:
+            logger.warning(
+                f'Slow command {command}: {duration_sec * 1000:.1f} ms'
+            )
+
+    def report(self) -> str:
+        """
+        Текстовый отчёт
+        """
+        lines = [
+            f'Event loop lag: last {self.lag_last_sec * 1000:.2f} ms, '
+            f'max {self.lag_max_sec * 1000:.2f} ms'
+        ]
+        for command, stats in sorted(self.command_stats.items()):
+            lines.append(
+                f'{command}: count {stats.count}, '
+                f'avg {stats.total_sec / stats.count * 1000:.3f} ms, '
+                f'max {stats.max_sec * 1000:.3f} ms'
+            )
+        return '\n'.join(lines) + '\n'
+
+    @property
+    def is_profiling(self) -> bool:
+        return self._profiler is not None
+
+    def start_profiler(self, thread_id: int) -> None:
+        """
+        Запуск профилировщика для потока thread_id
+        """
+        if self._profiler:
+            return
+
+        self._profiler = SamplingProfiler(thread_id)
+        self._profiler.start()
+        logger.info('Start sampling profiler')
+
+    def stop_profiler(self) -> str | None:
+        """
+        Остановка профилировщика и запись статистики в profile_file
+        """
+        if not self._profiler:
+            return None
+
+        profiler, self._profiler = self._profiler, None
+        profiler.stop()
+        profiler.dump(self.profile_file)
+        logger.info(f'Stop sampling profiler, stats: {self.profile_file}')
+        return self.profile_file
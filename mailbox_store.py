@@ -0,0 +1,213 @@
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from collections.abc import Iterator
+from itertools import islice
+from typing import TYPE_CHECKING, BinaryIO
+from urllib.parse import quote, unquote
+
+from config import logger
+
+if TYPE_CHECKING:
+    from server import Message
+
+MAILBOX_SUFFIX = '.mbox'
+MAILBOX_HEADER = struct.Struct('!Q')
+RECORD_HEADER = struct.Struct('!II')
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+class MailboxStore:
+    """
+    Хранилище входящих сообщений пользователей, которые не в сети:
+    по append-only файлу на пользователя. Каждая запись содержит длину,
+    контрольную сумму и сериализованное сообщение, поэтому запись,
+    оборванная при сбое, обнаруживается и отбрасывается. Заголовок файла
+    хранит смещение первой живой записи: самые старые сообщения
+    вытесняются сдвигом смещения без перезаписи файла.
+
+    Методы блокирующие; операции с входящими одного пользователя не
+    должны выполняться одновременно
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._checked: set[str] = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_name: str) -> str:
+        return os.path.join(
+            self.directory, f'{quote(user_name, safe="")}{MAILBOX_SUFFIX}'
+        )
+
+    def users(self) -> list[str]:
+        """
+        Пользователи с непустыми входящими
+        """
+        return [
+            unquote(name[: -len(MAILBOX_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(MAILBOX_SUFFIX)
+        ]
+
+    def has_messages(self, user_name: str) -> bool:
+        """
+        Проверка наличия сообщений
+        """
+        return os.path.exists(self._path(user_name))
+
+    def append(self, message: 'Message') -> None:
+        """
+        Добавление сообщения во входящие получателя
+        """
+        self._recover(message.recipient)
+        with open(self._path(message.recipient), 'ab') as file:
+            if not file.tell():
+                file.write(MAILBOX_HEADER.pack(MAILBOX_HEADER.size))
+            self._write_record(file, pickle.dumps(message))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def read(self, user_name: str) -> Iterator['Message']:
+        """
+        Последовательное чтение сообщений из отображённого в память файла
+        """
+        for message, _ in self._read_records(user_name):
+            yield message
+
+    def read_from(self, user_name: str, sender: str) -> list['Message']:
+        """
+        Сообщения отправителя sender во входящих пользователя
+        """
+        return [
+            message
+            for message in self.read(user_name)
+            if message.sender == sender
+        ]
+
+    def take(self, user_name: str) -> list['Message']:
+        """
+        Чтение всех сообщений и удаление входящих
+        """
+        messages = list(self.read(user_name))
+        self.remove(user_name)
+        return messages
+
+    def head(self, user_name: str, limit: int) -> list[tuple['Message', int]]:
+        """
+        Первые limit сообщений со смещениями концов их записей
+        """
+        return list(islice(self._read_records(user_name), limit))
+
+    def drop_head(self, user_name: str, offset: int) -> None:
+        """
+        Отбрасывание записей до смещения offset. Файл переписывается, только
+        когда отброшенные записи занимают больше половины файла
+        """
+        path = self._path(user_name)
+        size = os.path.getsize(path)
+        if offset >= size:
+            self.remove(user_name)
+        elif offset >= COMPACT_MIN_BYTES and offset * 2 >= size:
+            self._compact(path, offset)
+        else:
+            with open(path, 'r+b') as file:
+                file.write(MAILBOX_HEADER.pack(offset))
+                file.flush()
+                os.fsync(file.fileno())
+
+    def remove(self, user_name: str) -> None:
+        """
+        Удаление входящих после доставки
+        """
+        path = self._path(user_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def _write_record(file: BinaryIO, data: bytes) -> None:
+        file.write(RECORD_HEADER.pack(len(data), zlib.crc32(data)))
+        file.write(data)
+
+    @staticmethod
+    def _compact(path: str, offset: int) -> None:
+        """
+        Атомарная перезапись файла без отброшенных записей
+        """
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+        with open(f'{path}.tmp', 'wb') as file:
+            file.write(MAILBOX_HEADER.pack(MAILBOX_HEADER.size))
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f'{path}.tmp', path)
+
+    def _read_records(
+        self, user_name: str
+    ) -> Iterator[tuple['Message', int]]:
+        path = self._path(user_name)
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return
+
+        with open(path, 'rb') as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            for start, end in self._records(data):
+                yield pickle.loads(data[start:end]), end
+
+    @staticmethod
+    def _records(data: bytes | mmap.mmap) -> Iterator[tuple[int, int]]:
+        """
+        Границы целых записей после смещения из заголовка; разбор
+        прекращается на оборванной записи
+        """
+        if len(data) < MAILBOX_HEADER.size:
+            return
+
+        (offset,) = MAILBOX_HEADER.unpack_from(data)
+        while offset + RECORD_HEADER.size <= len(data):
+            size, checksum = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            end = start + size
+            if end > len(data) or zlib.crc32(data[start:end]) != checksum:
+                break
+            yield start, end
+            offset = end
+
+    def _recover(self, user_name: str) -> None:
+        """
+        Отбрасывание оборванной записи в конце файла (один раз за запуск)
+        """
+        if user_name in self._checked:
+            return
+
+        self._checked.add(user_name)
+        path = self._path(user_name)
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'r+b') as file:
+            data = file.read()
+            valid_size = max(
+                (end for _, end in self._records(data)),
+                default=self._start(data),
+            )
+            if valid_size < len(data):
+                logger.warning(
+                    f'Truncate broken mailbox {path} '
+                    f'from {len(data)} to {valid_size} bytes'
+                )
+                file.truncate(valid_size)
+
+    @staticmethod
+    def _start(data: bytes) -> int:
+        """
+        Смещение первой записи; 0 для файла без целого заголовка
+        """
+        if len(data) < MAILBOX_HEADER.size:
+            return 0
+        return min(MAILBOX_HEADER.unpack_from(data)[0], len(data))
@@ -0,0 +1,97 @@
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from server import Message
+
+MESSAGE_MAX_BYTES = 1000
+INBOX_MAX_MESSAGES = 1000
+INBOX_MAX_BYTES = 1024 * 1024
+SENDER_MAX_BYTES = 4 * 1024 * 1024
+OVERFLOW_REJECT = 'reject'
+OVERFLOW_EVICT_OLDEST = 'evict_oldest'
+
+
+def message_size(message: 'Message') -> int:
+    """
+    Размер текста сообщения в байтах
+    """
+    return len(message.text.encode())
+
+
+class MemoryAccounting:
+    """
+    Учёт памяти, занятой приватными сообщениями, по получателям и
+    отправителям и проверка квот
+    """
+
+    def __init__(
+        self,
+        inbox_max_messages: int = INBOX_MAX_MESSAGES,
+        inbox_max_bytes: int = INBOX_MAX_BYTES,
+        sender_max_bytes: int = SENDER_MAX_BYTES,
+        overflow_policy: str = OVERFLOW_REJECT,
+    ) -> None:
+        if overflow_policy not in (OVERFLOW_REJECT, OVERFLOW_EVICT_OLDEST):
+            raise ValueError(f'Unknown overflow policy: {overflow_policy}')
+
+        self.inbox_max_messages = inbox_max_messages
+        self.inbox_max_bytes = inbox_max_bytes
+        self.sender_max_bytes = sender_max_bytes
+        self.overflow_policy = overflow_policy
+        self.inbox_messages: Counter[str] = Counter()
+        self.inbox_bytes: Counter[str] = Counter()
+        self.sender_bytes: Counter[str] = Counter()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.inbox_bytes.values())
+
+    def add(self, message: 'Message') -> None:
+        """
+        Учёт сохранённого сообщения
+        """
+        size = message_size(message)
+        self.inbox_messages[message.recipient] += 1
+        self.inbox_bytes[message.recipient] += size
+        self.sender_bytes[message.sender] += size
+
+    def remove(self, message: 'Message') -> None:
+        """
+        Учёт удалённого сообщения
+        """
+        size = message_size(message)
+        self.inbox_messages[message.recipient] -= 1
+        self.inbox_bytes[message.recipient] -= size
+        self.sender_bytes[message.sender] -= size
+        for counter, key in (
+            (self.inbox_messages, message.recipient),
+            (self.inbox_bytes, message.recipient),
+            (self.sender_bytes, message.sender),
+        ):
+            if counter[key] <= 0:
+                del counter[key]
+
+    def is_sender_over_quota(self, sender: str, size: int) -> bool:
+        """
+        Проверка квоты отправителя
+        """
+        return self.sender_bytes[sender] + size > self.sender_max_bytes
+
+    def is_inbox_full(self, recipient: str, size: int) -> bool:
+        """
+        Проверка, что сообщение размером size не помещается во входящие
+        """
+        return (
+            self.inbox_messages[recipient] + 1 > self.inbox_max_messages
+            or self.inbox_bytes[recipient] + size > self.inbox_max_bytes
+        )
+
+    def top_inboxes(self, num: int) -> list[tuple[str, int, int]]:
+        """
+        Получатели с наибольшим объёмом входящих: (имя, байт, сообщений)
+        """
+        return [
+            (user_name, size, self.inbox_messages[user_name])
+            for user_name, size in self.inbox_bytes.most_common(num)
+        ]
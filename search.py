@@ -0,0 +1,122 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections.abc import Iterable, Iterator
+from itertools import groupby, islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from server import Message
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> set[str]:
+    """
+    Разбиение текста на токены для индекса
+    """
+    return set(TOKEN_PATTERN.findall(text.lower()))
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс сообщений: токен -> упорядоченный список id.
+    Списки ведутся отдельно для каждой области видимости (общий чат или
+    пользователь), поэтому поиск затрагивает только доступные сообщения
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, dict[str, list[int]]] = {}
+        self._messages: dict[int, 'Message'] = {}
+        self._scopes: dict[int, tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def add(self, message: 'Message', scopes: Iterable[str]) -> None:
+        """
+        Добавление сообщения в индекс областей видимости scopes. Обычно
+        id возрастают и добавляются в конец; сообщения из хранилища
+        входящих, доставленные при входе, вставляются по порядку
+        """
+        scopes = tuple(dict.fromkeys(scopes))
+        self._messages[message.id] = message
+        self._scopes[message.id] = scopes
+        tokens = tokenize(message.text)
+        for scope in scopes:
+            postings = self._postings.setdefault(scope, {})
+            for token in tokens:
+                ids = postings.setdefault(token, [])
+                if ids and ids[-1] > message.id:
+                    insort(ids, message.id)
+                else:
+                    ids.append(message.id)
+
+    def remove(self, message: 'Message') -> None:
+        """
+        Удаление сообщения из индекса
+        """
+        scopes = self._scopes.pop(message.id, None)
+        if scopes is None:
+            return
+
+        del self._messages[message.id]
+        tokens = tokenize(message.text)
+        for scope in scopes:
+            postings = self._postings[scope]
+            for token in tokens:
+                ids = postings[token]
+                i = bisect_left(ids, message.id)
+                if i < len(ids) and ids[i] == message.id:
+                    del ids[i]
+                if not ids:
+                    del postings[token]
+            if not postings:
+                del self._postings[scope]
+
+    def search(
+        self, query: str, scopes: Iterable[str], limit: int
+    ) -> list['Message']:
+        """
+        Поиск сообщений, содержащих все токены запроса, в областях
+        видимости scopes. Возвращает не более limit сообщений от новых
+        к старым
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        ids = heapq.merge(
+            *(
+                self._match(scope, tokens)
+                for scope in dict.fromkeys(scopes)
+            ),
+            reverse=True,
+        )
+        messages = (self._messages[i] for i, _ in groupby(ids))
+        return list(islice(messages, limit))
+
+    def _match(self, scope: str, tokens: set[str]) -> Iterator[int]:
+        """
+        Пересечение списков id токенов в области видимости по убыванию id
+        """
+        postings = self._postings.get(scope, {})
+        lists = [postings.get(token) for token in tokens]
+        if not all(lists):
+            return iter(())
+
+        lists.sort(key=len)
+        shortest, others = lists[0], lists[1:]
+        return (
+            message_id
+            for message_id in reversed(shortest)
+            if all(_contains(ids, message_id) for ids in others)
+        )
+
+
+def _contains(ids: list[int], message_id: int) -> bool:
+    """
+    Проверка наличия id в упорядоченном списке
+    """
+    i = bisect_left(ids, message_id)
+    return i < len(ids) and ids[i] == message_id
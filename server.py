@@ -1,15 +1,50 @@
 import asyncio
+import heapq
+import os
 import pickle
 import signal
 import time
 from asyncio.streams import StreamReader, StreamWriter
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass
-from threading import Event, Thread
-
+from itertools import islice
+from operator import attrgetter
+from threading import Event, Thread, get_ident
+from typing import Any, TypeVar
+
+from commands import (
+    COMMANDS,
+    BoundCommand,
+    HistoryArgs,
+    LoginArgs,
+    SearchArgs,
+    SendAllArgs,
+    SendArgs,
+)
+from compression import COMPRESSION_ACK, COMPRESSION_METHOD, CompressedWriter
 from config import logger
+from conversations import ConversationIndex
+from dedup import CLIENT_ID_SEPARATOR, DedupWindow
+from diagnostics import Diagnostics
+from mailbox_store import MailboxStore
+from quotas import (
+    INBOX_MAX_BYTES,
+    INBOX_MAX_MESSAGES,
+    MESSAGE_MAX_BYTES,
+    OVERFLOW_REJECT,
+    SENDER_MAX_BYTES,
+    MemoryAccounting,
+)
+from search import SearchIndex, tokenize
 
 STATE_FILE = 'server_data.pickle'
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_PREFIX = 'server_data_'
+CHECKPOINT_INTERVAL_SEC = 0.0
+CHECKPOINT_KEEP_NUM = 3
+LEGACY_STATE_LEN = 3
 PUBLIC_MESSAGES_NUM = 20
 BAN_LIMIT_NUM = 3
 BAN_TIME_SEC = 4 * 60 * 60
@@ -19,6 +54,19 @@ MESSAGES_LIMIT_INTERVAL_SEC = 60 * 60
 READ_MESSAGES_TTL_SEC = 60 * 60
 WAIT_DELETE_READ_MESSAGES_SEC = 60
 WAIT_RESET_LIMIT_SENT_MESSAGES_SEC = 60
+HISTORY_PUBLIC_ID = 'all'
+RESERVED_NAMES = frozenset((PUBLIC_ID, HISTORY_PUBLIC_ID))
+NOT_LOGIN_TEXT = 'The command is not available to unregistered users'
+HISTORY_LIMIT_DEFAULT = 20
+HISTORY_LIMIT_MAX = 100
+SEARCH_RESULTS_LIMIT = 20
+BROADCAST_WINDOW_SEC = 0.0
+BROADCAST_BATCH_SIZE = 100
+MEMORY_TOP_INBOXES_NUM = 10
+MAILBOX_EVICT_BATCH = 10
+COMMAND_OVERHEAD_BYTES = 256
+
+T = TypeVar('T')
 
 
 @dataclass
@@ -47,6 +95,7 @@ class Message:
     create_at: float
     recipient: str | None = None
     read_time: float = 0
+    id: int = 0
 
 
 @dataclass
@@ -69,21 +118,75 @@ class Server:
         host: str = '127.0.0.1',
         port: int = 8000,
         restore_data: bool = False,
+        broadcast_window_sec: float = BROADCAST_WINDOW_SEC,
+        broadcast_batch_size: int = BROADCAST_BATCH_SIZE,
+        checkpoint_interval_sec: float = CHECKPOINT_INTERVAL_SEC,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        checkpoint_keep_num: int = CHECKPOINT_KEEP_NUM,
+        diagnostics: bool = False,
+        admins: Iterable[str] = (),
+        max_message_bytes: int = MESSAGE_MAX_BYTES,
+        inbox_max_messages: int = INBOX_MAX_MESSAGES,
+        inbox_max_bytes: int = INBOX_MAX_BYTES,
+        sender_max_bytes: int = SENDER_MAX_BYTES,
+        inbox_overflow_policy: str = OVERFLOW_REJECT,
+        mailbox_dir: str | None = None,
     ) -> None:
+        if checkpoint_keep_num < 1:
+            raise ValueError(
+                f'Checkpoint keep number must be positive: '
+                f'{checkpoint_keep_num}'
+            )
+
         self.host = host
         self.port = port
+        self.broadcast_window_sec = broadcast_window_sec
+        self.broadcast_batch_size = broadcast_batch_size
+        self.checkpoint_interval_sec = checkpoint_interval_sec
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_keep_num = checkpoint_keep_num
+        self.diagnostics_enabled = diagnostics
+        self.admins = set(admins)
+        self.max_message_bytes = max_message_bytes
+        # Строка длиннее сообщения с именем команды, идентификатором и
+        # получателем отклоняется при чтении, не попадая в буфер целиком
+        self.read_limit = max_message_bytes + COMMAND_OVERHEAD_BYTES
         self.users: dict[str, User] = {}
         self.private_messages: dict[str, list[Message]] = defaultdict(list)
         self.public_messages: list[Message] = []
         self._sessions: dict[tuple, Session] = {}
+        self._last_message_id: int = 0
+        self._search_index: SearchIndex = SearchIndex()
+        self._conversations: ConversationIndex = ConversationIndex()
+        self._dedup: DedupWindow = DedupWindow()
+        self._memory: MemoryAccounting = MemoryAccounting(
+            inbox_max_messages=inbox_max_messages,
+            inbox_max_bytes=inbox_max_bytes,
+            sender_max_bytes=sender_max_bytes,
+            overflow_policy=inbox_overflow_policy,
+        )
+        self._mailbox: MailboxStore | None = (
+            MailboxStore(mailbox_dir) if mailbox_dir else None
+        )
+        self._mailbox_locks: defaultdict[str, asyncio.Lock] = defaultdict(
+            asyncio.Lock
+        )
+        self._broadcast_texts: list[str] = []
+        self._broadcast_task: asyncio.Task | None = None
         self._thread: Thread | None = None
         self._server_task: asyncio.Task | None = None
         self._delete_read_messages_task: asyncio.Task | None = None
         self._reset_limit_sent_messages_task: asyncio.Task | None = None
+        self._checkpoint_task: asyncio.Task | None = None
+        self._lag_monitor_task: asyncio.Task | None = None
+        self._diagnostics: Diagnostics = Diagnostics()
         self._ban_lock: asyncio.Lock = asyncio.Lock()
         self._message_lock: asyncio.Lock = asyncio.Lock()
         self._message_limit_lock: asyncio.Lock = asyncio.Lock()
         self._event: Event = Event()
+        self._commands = {
+            command.name.encode(): command.bind(self) for command in COMMANDS
+        }
 
         if restore_data:
             self._load_data()
@@ -96,6 +199,7 @@ class Server:
             client_connected_cb=self._client_handler,
             host=self.host,
             port=self.port,
+            limit=self.read_limit,
         )
 
         async with server:
@@ -105,6 +209,15 @@ class Server:
             self._reset_limit_sent_messages_task = asyncio.create_task(
                 self._reset_limit_sent_messages()
             )
+            if self.checkpoint_interval_sec:
+                self._checkpoint_task = asyncio.create_task(
+                    self._checkpoint_state()
+                )
+            if self.diagnostics_enabled:
+                self._diagnostics.enable_slow_callbacks()
+                self._lag_monitor_task = asyncio.create_task(
+                    self._diagnostics.monitor_lag()
+                )
             logger.info(f'Start server (host:{self.host} port:{self.port})')
             self._server_task = asyncio.create_task(server.serve_forever())
             await self._stop_server()
@@ -127,6 +240,7 @@ class Server:
                             < time.time()
                         ):
                             messages.remove(message)
+                            self._forget_private_message(message)
                             logger.info(
                                 (
                                     f'Delete message: From: {message.sender} '
@@ -161,6 +275,77 @@ class Server:
 
             await asyncio.sleep(WAIT_RESET_LIMIT_SENT_MESSAGES_SEC)
 
+    async def _checkpoint_state(self) -> None:
+        """
+        Периодическое сохранение данных сервера в фоне
+        """
+        logger.info('Start checkpoint task')
+        while True:
+            await asyncio.sleep(self.checkpoint_interval_sec)
+            await self._checkpoint()
+
+    async def _checkpoint(self) -> float:
+        """
+        Сохранение контрольной точки. Данные записываются дочерним
+        процессом (fork), который получает копию памяти сервера при
+        копировании страниц по записи, поэтому цикл событий не ждёт
+        сериализации. Возвращает время блокировки цикла событий
+        """
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(
+            self.checkpoint_dir, f'{CHECKPOINT_PREFIX}{time.time_ns()}.pickle'
+        )
+        start = time.perf_counter()
+        if not hasattr(os, 'fork'):
+            self._dump_state(path)
+            stall = time.perf_counter() - start
+        else:
+            pid = os.fork()
+            if pid == 0:
+                exit_code = 1
+                try:
+                    self._dump_state(path)
+                    exit_code = 0
+                except Exception:
+                    logger.exception(f'Checkpoint {path} failed')
+                finally:
+                    os._exit(exit_code)
+
+            stall = time.perf_counter() - start
+            _, status = await asyncio.to_thread(os.waitpid, pid, 0)
+            if os.waitstatus_to_exitcode(status):
+                logger.error(f'Checkpoint {path} failed')
+                return stall
+
+        logger.info(
+            f'Server save checkpoint {path} '
+            f'(event loop stall {stall * 1000:.2f} ms)'
+        )
+        self._remove_old_checkpoints()
+        return stall
+
+    def _checkpoints(self) -> list[str]:
+        """
+        Пути сохранённых контрольных точек от старых к новым
+        """
+        if not os.path.isdir(self.checkpoint_dir):
+            return []
+
+        return [
+            os.path.join(self.checkpoint_dir, name)
+            for name in sorted(os.listdir(self.checkpoint_dir))
+            if name.startswith(CHECKPOINT_PREFIX) and name.endswith('.pickle')
+        ]
+
+    def _remove_old_checkpoints(self) -> None:
+        """
+        Удаление контрольных точек сверх checkpoint_keep_num последних
+        """
+        checkpoints = self._checkpoints()
+        for path in checkpoints[: -self.checkpoint_keep_num]:
+            os.remove(path)
+            logger.info(f'Remove checkpoint {path}')
+
     async def _stop_server(self) -> None:
         """
         Остановка запущенных задач
@@ -169,6 +354,12 @@ class Server:
             await asyncio.sleep(1)
         self._delete_read_messages_task.cancel()
         self._reset_limit_sent_messages_task.cancel()
+        await self._flush_broadcast()
+        if self._checkpoint_task:
+            self._checkpoint_task.cancel()
+        if self._lag_monitor_task:
+            self._lag_monitor_task.cancel()
+            self._diagnostics.disable_slow_callbacks()
         self._server_task.cancel()
 
     def run(self) -> None:
@@ -176,6 +367,8 @@ class Server:
         Запуск сервера
         """
         signal.signal(signal.SIGINT, self._signal_handler)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._profile_signal_handler)
         self._event = Event()
         self._thread = Thread(target=self._start_server_tasks, daemon=True)
         self._thread.start()
@@ -203,6 +396,15 @@ class Server:
         self.stop()
         exit(0)
 
+    def _profile_signal_handler(self, signal, frame):
+        """
+        Обработчик сигнала включения/выключения профилировщика
+        """
+        if self._diagnostics.is_profiling:
+            self._diagnostics.stop_profiler()
+        else:
+            self._diagnostics.start_profiler(self._thread.ident)
+
     def _start_server_tasks(self) -> None:
         """
         Запуск задач для работы сервера сообщений
@@ -213,7 +415,9 @@ class Server:
         self, reader: StreamReader, writer: StreamWriter
     ) -> None:
         """
-        Обработчик клиентской сессии
+        Обработчик клиентской сессии. Команды разделяются переводом строки,
+        поэтому клиент может отправлять следующие команды, не дожидаясь
+        ответа на предыдущие
         """
         session_id = writer.get_extra_info('peername')
         logger.info(
@@ -221,48 +425,177 @@ class Server:
         )
         self._sessions[session_id] = Session(writer=writer)
 
-        while True:
-            data = await reader.read(1024)
+        while session_id in self._sessions:
+            try:
+                data = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as error:
+                data = error.partial
+            except asyncio.LimitOverrunError as error:
+                text = 'Command is too long'
+                logger.info(text)
+                await self._write_message(
+                    self._sessions[session_id].writer, text
+                )
+                await self._skip_line(reader, error.consumed)
+                continue
             if not data:
                 break
-            line = data.decode().strip()
-            logger.info(f'Server received: {line}')
+            line = data.strip()
+            if not line:
+                continue
+            logger.info('Server received: %s', line)
             await self._command(line, session_id)
 
         if not writer.is_closing():
             self._close_client_writer(session_id)
 
+    @staticmethod
+    async def _skip_line(reader: StreamReader, consumed: int) -> None:
+        """
+        Пропуск остатка слишком длинной команды до перевода строки, чтобы
+        её продолжение не выполнялось как отдельная команда
+        """
+        try:
+            while True:
+                await reader.readexactly(consumed)
+                try:
+                    await reader.readuntil(b'\n')
+                    return
+                except asyncio.LimitOverrunError as error:
+                    consumed = error.consumed
+        except asyncio.IncompleteReadError:
+            return
+
     async def _write_message(self, writer: StreamWriter, text: str) -> None:
         """
-        Вывод текста
+        Вывод текста; каждый ответ завершается переводом строки
         """
+        if not text.endswith('\n'):
+            text += '\n'
         output = text.encode()
         writer.write(output)
         await writer.drain()
 
-    async def _command(self, line: str, session_id: tuple) -> None:
-        """
-        Обработка команд
-        """
-        tokens = line.split(maxsplit=1)
-        command = tokens[0]
-        match command:
-            case 'login':
-                await self._command_login(tokens[1:], session_id)
-            case 'send_all':
-                await self._command_send_all(tokens[1:], session_id)
-            case 'send':
-                await self._command_send_user(tokens[1:], session_id)
-            case 'ban':
-                await self._command_ban_user(tokens[1:], session_id)
-            case 'quit':
-                await self._command_quit(session_id)
-            case _:
-                text = f'Command not found: {command}'
-                await self._write_message(
-                    self._sessions[session_id].writer, text
-                )
-                logger.info(text)
+    async def _command(self, line: bytes, session_id: tuple) -> None:
+        """
+        Обработка команды: поиск в реестре по имени, разбор аргументов,
+        проверки и вызов обработчика. Проверка возвращает ответ,
+        прерывающий выполнение команды
+        """
+        word, _, data = line.partition(b' ')
+        client_id = None
+        command = self._commands.get(word)
+        if command is None:
+            command, client_id = self._find_tagged_command(word)
+        if command is None:
+            text = f'Command not found: {word.decode(errors="replace")}'
+            await self._write_message(self._sessions[session_id].writer, text)
+            logger.info(text)
+            return
+
+        start = time.perf_counter() if self.diagnostics_enabled else 0.0
+        session = self._sessions[session_id]
+        if command.login and session.user_name is None:
+            text = NOT_LOGIN_TEXT
+        else:
+            args = command.parser(data) if command.parser else None
+            if client_id:
+                args.client_id = client_id
+            text = (
+                self._run_checks(command, args, session)
+                if command.checks
+                else None
+            )
+            if not text and command.parser:
+                await command.handler(args, session_id)
+            elif not text:
+                await command.handler(session_id)
+        if text:
+            logger.info(text)
+            await self._write_message(session.writer, text)
+
+        if self.diagnostics_enabled:
+            self._diagnostics.record_command(
+                command.name, time.perf_counter() - start
+            )
+
+    @staticmethod
+    def _run_checks(
+        command: BoundCommand, args: Any, session: Session
+    ) -> str | None:
+        """
+        Проверки команды; возвращает ответ первой не пройденной
+        """
+        for check in command.checks:
+            if text := check(args, session):
+                return text
+        return None
+
+    def _find_tagged_command(
+        self, word: bytes
+    ) -> tuple[BoundCommand | None, str | None]:
+        """
+        Поиск команды с идентификатором сообщения клиента в первом слове
+        строки (<command>:<client_id>)
+        """
+        name, _, client_id = word.partition(CLIENT_ID_SEPARATOR)
+        command = self._commands.get(name) if client_id else None
+        if command is None or not command.client_id:
+            return None, None
+        return command, client_id.decode()
+
+    def _check_admin(self, args: Any, session: Session) -> str | None:
+        """
+        Проверка прав администратора
+        """
+        if session.user_name not in self.admins:
+            return 'The command is available to administrators only'
+        return None
+
+    def _check_ban(self, args: Any, session: Session) -> str | None:
+        """
+        Проверка бана отправителя
+        """
+        user = self.users[session.user_name]
+        during_time = user.ban_time - time.time()
+        if during_time <= 0:
+            return None
+        return (
+            f'The user cannot send messages during {round(during_time)} sec.'
+        )
+
+    def _check_rate_limit(self, args: Any, session: Session) -> str | None:
+        """
+        Проверка лимита публичных сообщений отправителя
+        """
+        user = self.users[session.user_name]
+        if user.messages_sent_per_hour_num < MESSAGES_PER_INTERVAL_LIMIT:
+            return None
+
+        during_time = round(
+            user.message_limit_time + MESSAGES_LIMIT_INTERVAL_SEC - time.time()
+        )
+        return f'The user cannot send messages during {during_time} sec.'
+
+    def _check_dedup(
+        self, args: SendArgs | SendAllArgs, session: Session
+    ) -> str | None:
+        """
+        Проверка повторной отправки сообщения с идентификатором клиента.
+        На повтор отправляется подтверждение исходного сообщения
+        """
+        if args.client_id is None:
+            return None
+
+        user_name = session.user_name
+        message_id = self._dedup.get(user_name, args.client_id)
+        if message_id is None:
+            return None
+
+        logger.info(
+            f'Skip duplicate message {args.client_id} from {user_name}'
+        )
+        return self._format_ack(args.client_id, message_id)
 
     def _is_login(self, session_id: tuple) -> bool:
         """
@@ -276,186 +609,462 @@ class Server:
         """
         return self.users[user_name].ban_time > time.time()
 
-    def _is_send_messages_limit(self, user_name) -> bool:
+    async def _command_quit(self, session_id: tuple) -> None:
         """
-        Проверка лимита отправленных сообщений
+        Команда выхода пользователя
         """
-        return (
-            self.users[user_name].messages_sent_per_hour_num
-            >= MESSAGES_PER_INTERVAL_LIMIT
+        self._close_client_writer(session_id)
+
+    async def _command_stats(self, session_id: tuple) -> None:
+        """
+        Команда вывода диагностической статистики (для администраторов)
+        """
+        if not self.diagnostics_enabled:
+            text = 'Diagnostics is disabled'
+            logger.info(text)
+            await self._write_message(self._sessions[session_id].writer, text)
+            return
+
+        await self._write_message(
+            self._sessions[session_id].writer, self._diagnostics.report()
         )
 
-    async def _command_quit(self, session_id: tuple) -> None:
+    async def _command_profile(
+        self, action: str | None, session_id: tuple
+    ) -> None:
         """
-        Команда выхода пользователя
+        Команда запуска и остановки профилировщика (для администраторов)
         """
-        self._close_client_writer(session_id)
+        match action:
+            case 'start':
+                self._diagnostics.start_profiler(get_ident())
+                text = 'Profiler is running'
+            case 'stop':
+                path = self._diagnostics.stop_profiler()
+                text = (
+                    f'Profiler stats saved to {path}'
+                    if path
+                    else 'Profiler is not running'
+                )
+            case _:
+                text = 'Usage: profile start|stop'
+        logger.info(text)
+        await self._write_message(self._sessions[session_id].writer, text)
+
+    async def _command_memory(self, session_id: tuple) -> None:
+        """
+        Команда вывода памяти, занятой приватными сообщениями
+        (для администраторов)
+        """
+        lines = [f'Private messages: {self._memory.total_bytes} bytes']
+        for user_name, size, num in self._memory.top_inboxes(
+            MEMORY_TOP_INBOXES_NUM
+        ):
+            lines.append(f'{user_name}: {size} bytes, {num} messages')
+        await self._write_message(
+            self._sessions[session_id].writer, '\n'.join(lines) + '\n'
+        )
+
+    async def _command_compress(
+        self, method: str | None, session_id: tuple
+    ) -> None:
+        """
+        Команда включения сжатия больших пакетов сообщений для соединения
+        """
+        session = self._sessions[session_id]
+        if method != COMPRESSION_METHOD:
+            text = f'Supported compression: {COMPRESSION_METHOD}'
+            logger.info(text)
+            await self._write_message(session.writer, text)
+            return
+
+        if isinstance(session.writer, CompressedWriter):
+            text = 'Compression is already enabled'
+            logger.info(text)
+            await self._write_message(session.writer, text)
+            return
+
+        await self._write_message(session.writer, COMPRESSION_ACK)
+        session.writer = CompressedWriter(session.writer)
+        logger.info(
+            f'Enable compression (host:{session_id[0]} port:{session_id[1]})'
+        )
 
     async def _command_login(
-        self, tokens: list[str], session_id: tuple
+        self, args: LoginArgs, session_id: tuple
     ) -> None:
         """
-        Команда регистрация пользователя
+        Команда регистрация пользователя. С идентификатором клиента
+        после вывода сообщений отправляется подтверждение входа
         """
-        if not tokens:
+        user_name = args.user_name
+        if not user_name:
             text = 'No login name'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
-        user_name = tokens[0].split(maxsplit=1)[0]
+        if user_name in RESERVED_NAMES:
+            text = f'Login name is reserved: {user_name}'
+            logger.info(text)
+            await self._write_message(self._sessions[session_id].writer, text)
+            return
+
         self._sessions[session_id].user_name = user_name
         user = self.users.get(user_name)
         writer = self._sessions[session_id].writer
-        if user:
+        if not user:
+            self.users[user_name] = User(name=user_name, session=session_id)
+            await self._write_some_public_messages(writer, user_name)
+        else:
             user.message_limit_time = 0
             user.messages_sent_per_hour_num = 0
+            # Сессия назначается до вывода непрочитанных, чтобы сообщения,
+            # отправленные во время вывода, доставлялись сразу, а не
+            # попадали в уже прочитанные входящие на диске
+            user.session = session_id
             await self._write_unread_messages(writer, user_name)
-        else:
-            self.users[user_name] = User(name=user_name)
-            await self._write_some_public_messages(writer)
 
-        self.users[user_name].session = session_id
+        if args.client_id:
+            await self._write_ack(args.client_id, None, session_id)
 
     async def _write_unread_messages(
         self, writer: StreamWriter, user_name: str
     ) -> None:
         """
         Вывод непрочитанных публичных и приватных сообщений пользователя
+        одним пакетом
         """
-        for message in self.private_messages[user_name]:
-            async with self._message_lock:
+        texts = []
+        async with self._message_lock:
+            await self._load_mailbox(user_name)
+            for message in self.private_messages[user_name]:
                 if message.read_time == 0:
-                    await self._write_message_to_user(writer, message)
+                    texts.append(self._format_message(message))
                     message.read_time = time.time()
+                    self._conversations.mark_read(message)
 
         for message in self.public_messages:
             if message.create_at > self.users[user_name].exit_time:
-                await self._write_message_to_user(writer, message)
+                texts.append(self._format_message(message))
+
+        await self._write_messages_batch(writer, texts, user_name)
 
-    async def _write_some_public_messages(self, writer) -> None:
+    async def _load_mailbox(self, user_name: str) -> None:
         """
-        Вывод последних (PUBLIC_MESSAGES_NUM) непрочитанных публичных сообщений
-        для только что зарегистрированного пользователя
+        Перенос входящих пользователя с диска в память при входе
+        """
+        if not self._mailbox:
+            return
+
+        messages = self.private_messages[user_name]
+        stored = await self._mailbox_io(
+            user_name, self._mailbox.take, user_name
+        )
+        for message in stored:
+            messages.append(message)
+            self._search_index.add(message, (message.sender, user_name))
+            self._conversations.store(message)
+
+    async def _mailbox_io(
+        self, user_name: str, method: Callable[..., T], *args: Any
+    ) -> T:
         """
-        for message in self.public_messages[-PUBLIC_MESSAGES_NUM:]:
-            await self._write_message_to_user(writer, message)
+        Выполнение операции с входящими пользователя на диске в отдельном
+        потоке. Операции с входящими одного пользователя выполняются по
+        очереди в порядке вызова
+        """
+        async with self._mailbox_locks[user_name]:
+            return await asyncio.to_thread(method, *args)
 
-    async def _command_send_all(
-        self, tokens: list[str], session_id: tuple
+    async def _write_some_public_messages(
+        self, writer: StreamWriter, user_name: str
     ) -> None:
         """
-        Команда отправки публичного сообщения
+        Вывод последних (PUBLIC_MESSAGES_NUM) непрочитанных публичных сообщений
+        для только что зарегистрированного пользователя одним пакетом
         """
-        if not self._is_login(session_id):
-            text = 'The command is not available to unregistered users'
-            logger.info(text)
-            await self._write_message(self._sessions[session_id].writer, text)
+        texts = [
+            self._format_message(message)
+            for message in self.public_messages[-PUBLIC_MESSAGES_NUM:]
+        ]
+        await self._write_messages_batch(writer, texts, user_name)
+
+    async def _write_messages_batch(
+        self, writer: StreamWriter, texts: list[str], user_name: str
+    ) -> None:
+        """
+        Отправка пакета сообщений одной записью
+        """
+        if not texts:
             return
 
-        user_name = self._sessions[session_id].user_name
-        if self._is_ban(user_name):
-            during_time = round(self.users[user_name].ban_time - time.time())
-            text = f'The user cannot send messages during {during_time} sec.'
-            logger.info(text)
-            await self._write_message(self._sessions[session_id].writer, text)
-            return
+        logger.info(f'Send {len(texts)} messages to {user_name}')
+        await self._write_message(writer, ''.join(texts))
 
-        user = self.users[user_name]
-        if self._is_send_messages_limit(user_name):
-            during_time = round(
-                user.message_limit_time
-                + MESSAGES_LIMIT_INTERVAL_SEC
-                - time.time()
-            )
-            text = f'The user cannot send messages during {during_time} sec.'
+    async def _command_send_all(
+        self, args: SendAllArgs, session_id: tuple
+    ) -> None:
+        """
+        Команда отправки публичного сообщения
+        """
+        text = args.text
+        if not text:
+            text = 'No message text'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
-        if not tokens:
-            text = 'No message text'
+        if len(text.encode()) > self.max_message_bytes:
+            text = f'Message is too large (max {self.max_message_bytes} bytes)'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
+        user = self.users[self._sessions[session_id].user_name]
         message = Message(
-            sender=self._sessions[session_id].user_name,
+            sender=user.name,
             create_at=time.time(),
-            text=tokens[0],
+            text=text,
+            id=self._next_message_id(),
         )
 
         self.public_messages.append(message)
+        self._search_index.add(message, (PUBLIC_ID,))
         async with self._message_limit_lock:
             if user.message_limit_time == 0:
                 user.message_limit_time = time.time()
             user.messages_sent_per_hour_num += 1
 
+        await self._acknowledge(args.client_id, message, session_id)
         await self._send_public_message(message)
 
     async def _send_public_message(self, message: Message) -> None:
         """
-        Отправка публичного сообщения
+        Отправка публичного сообщения. При заданном broadcast_window_sec
+        сообщения накапливаются в течение окна (или до broadcast_batch_size
+        сообщений) и отправляются каждой сессии одной записью
         """
-        for session in self._sessions.values():
-            message.recipient = PUBLIC_ID
-            await self._write_message_to_user(session.writer, message)
+        message.recipient = PUBLIC_ID
+        if not self.broadcast_window_sec:
+            for session in self._sessions.values():
+                await self._write_message_to_user(session.writer, message)
+            return
 
-    async def _command_send_user(
-        self, tokens: list[str], session_id: tuple
-    ) -> None:
+        self._broadcast_texts.append(self._format_message(message))
+        if len(self._broadcast_texts) >= self.broadcast_batch_size:
+            await self._flush_broadcast()
+        elif self._broadcast_task is None:
+            self._broadcast_task = asyncio.create_task(
+                self._flush_broadcast_later()
+            )
+
+    async def _flush_broadcast_later(self) -> None:
         """
-        Команда отправки приватного сообщения
+        Отправка накопленных публичных сообщений по окончании окна
         """
+        await asyncio.sleep(self.broadcast_window_sec)
+        self._broadcast_task = None
+        await self._flush_broadcast()
 
-        if not self._is_login(session_id):
-            text = 'The command is not available to unregistered users'
-            logger.info(text)
-            await self._write_message(self._sessions[session_id].writer, text)
-            return
+    async def _flush_broadcast(self) -> None:
+        """
+        Отправка накопленных публичных сообщений всем сессиям
+        """
+        if self._broadcast_task:
+            self._broadcast_task.cancel()
+            self._broadcast_task = None
 
-        user_name = self._sessions[session_id].user_name
-        if self._is_ban(user_name):
-            during_time = round(self.users[user_name].ban_time - time.time())
-            text = f'The user cannot send messages during {during_time} sec.'
-            logger.info(text)
-            await self._write_message(self._sessions[session_id].writer, text)
+        texts, self._broadcast_texts = self._broadcast_texts, []
+        if not texts:
             return
 
-        if not tokens:
+        logger.info(
+            f'Send {len(texts)} public messages to '
+            f'{len(self._sessions)} sessions'
+        )
+        text = ''.join(texts)
+        for session in list(self._sessions.values()):
+            await self._write_message(session.writer, text)
+
+    async def _command_send_user(
+        self, args: SendArgs, session_id: tuple
+    ) -> None:
+        """
+        Команда отправки приватного сообщения
+        """
+        recipient = args.recipient
+        if not recipient:
             text = 'Recipient is not specified'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
-        recipient = tokens[0].split(maxsplit=1)[0]
         if recipient not in self.users:
             text = f'Recipient {recipient} does not exist'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
-        text = tokens[0].split(maxsplit=1)[1:]
-        if not text:
+        if not args.text:
             text = 'No message text'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
+        user_name = self._sessions[session_id].user_name
+        error = await self._check_private_message(
+            user_name, recipient, args.text
+        )
+        if error:
+            logger.info(error)
+            await self._write_message(self._sessions[session_id].writer, error)
+            return
+
         message = Message(
-            sender=self._sessions[session_id].user_name,
+            sender=user_name,
             recipient=recipient,
-            text=text[0],
+            text=args.text,
             create_at=time.time(),
+            id=self._next_message_id(),
+        )
+        self._memory.add(message)
+        await self._acknowledge(args.client_id, message, session_id)
+        await self._deliver_private_message(message)
+
+    async def _check_private_message(
+        self, sender: str, recipient: str, text: str
+    ) -> str | None:
+        """
+        Проверка размера сообщения и квот; при необходимости освобождает
+        место во входящих получателя. Возвращает текст ошибки
+        """
+        size = len(text.encode())
+        if size > self.max_message_bytes:
+            return f'Message is too large (max {self.max_message_bytes} bytes)'
+
+        if self._memory.is_sender_over_quota(sender, size):
+            return 'Sender quota exceeded'
+
+        if not await self._free_inbox(recipient, size):
+            return f'Inbox of {recipient} is full'
+
+        return None
+
+    async def _acknowledge(
+        self, client_id: str | None, message: Message, session_id: tuple
+    ) -> None:
+        """
+        Запоминание и подтверждение сообщения с идентификатором клиента
+        """
+        if client_id is None:
+            return
+
+        self._dedup.add(message.sender, client_id, message.id)
+        await self._write_ack(client_id, message.id, session_id)
+
+    async def _write_ack(
+        self, client_id: str, message_id: int | None, session_id: tuple
+    ) -> None:
+        """
+        Отправка подтверждения выполнения команды (и id сохранённого
+        сообщения)
+        """
+        await self._write_message(
+            self._sessions[session_id].writer,
+            self._format_ack(client_id, message_id),
         )
-        self.private_messages[recipient].append(message)
 
-        user = self.users[recipient]
+    @staticmethod
+    def _format_ack(client_id: str, message_id: int | None) -> str:
+        """
+        Представление подтверждения для вывода
+        """
+        if message_id is None:
+            return f'Ack: {client_id}'
+        return f'Ack: {client_id} Id: {message_id}'
+
+    async def _deliver_private_message(self, message: Message) -> None:
+        """
+        Сохранение и доставка приватного сообщения. Для получателя не в сети
+        при включённом хранилище входящих сообщение записывается на диск
+        """
+        user = self.users[message.recipient]
+        if self._mailbox and not user.session:
+            self._conversations.add(message, stored=False)
+            await self._mailbox_io(
+                message.recipient, self._mailbox.append, message
+            )
+            return
+
+        self.private_messages[message.recipient].append(message)
+        self._search_index.add(message, (message.sender, message.recipient))
+        self._conversations.add(message)
         if user.session:
             await self._write_message_to_user(
                 self._sessions[user.session].writer, message
             )
             message.read_time = time.time()
+            self._conversations.mark_read(message)
+
+    async def _free_inbox(self, recipient: str, size: int) -> bool:
+        """
+        Освобождение места во входящих получателя для сообщения размером
+        size. При политике evict_oldest удаляются самые старые сообщения.
+        Возвращает False, если место освободить нельзя
+        """
+        if not self._memory.is_inbox_full(recipient, size):
+            return True
+        if self._memory.overflow_policy == OVERFLOW_REJECT:
+            return False
+
+        messages = self.private_messages[recipient]
+        async with self._message_lock:
+            while messages and self._memory.is_inbox_full(recipient, size):
+                self._evict_message(messages.pop(0))
+
+            if self._mailbox:
+                await self._evict_from_mailbox(recipient, size)
+
+        return not self._memory.is_inbox_full(recipient, size)
+
+    async def _evict_from_mailbox(self, recipient: str, size: int) -> None:
+        """
+        Вытеснение самых старых сообщений из входящих на диске: читаются
+        только первые записи, файл не переписывается
+        """
+        while self._memory.is_inbox_full(recipient, size):
+            records = await self._mailbox_io(
+                recipient, self._mailbox.head, recipient, MAILBOX_EVICT_BATCH
+            )
+            offset = None
+            for message, end in records:
+                if not self._memory.is_inbox_full(recipient, size):
+                    break
+                self._evict_message(message)
+                offset = end
+            if offset is None:
+                return
+            await self._mailbox_io(
+                recipient, self._mailbox.drop_head, recipient, offset
+            )
+
+    def _evict_message(self, message: Message) -> None:
+        """
+        Вытеснение сообщения из переполненных входящих
+        """
+        self._forget_private_message(message)
+        logger.info(
+            f'Evict message: From: {message.sender} To: {message.recipient}'
+        )
+
+    def _forget_private_message(self, message: Message) -> None:
+        """
+        Удаление приватного сообщения из индексов и учёта памяти
+        """
+        self._search_index.remove(message)
+        self._conversations.remove(message)
+        self._memory.remove(message)
 
     async def _write_message_to_user(
         self, writer: StreamWriter, message: Message
@@ -466,31 +1075,236 @@ class Server:
         logger.info(
             f'Send message form {message.sender} to {message.recipient}'
         )
-        text = (
-            f'From: {message.sender} To: {message.recipient} '
-            f'Text: {message.text}\n'
+        await self._write_message(writer, self._format_message(message))
+
+    @staticmethod
+    def _format_message(message: Message) -> str:
+        """
+        Представление сообщения для вывода
+        """
+        return (
+            f'Id: {message.id} From: {message.sender} '
+            f'To: {message.recipient} Text: {message.text}\n'
         )
-        await self._write_message(writer, text)
 
-    async def _command_ban_user(
-        self, tokens: list[str], session_id: tuple
+    def _next_message_id(self) -> int:
+        """
+        Получение идентификатора для нового сообщения
+        """
+        self._last_message_id += 1
+        return self._last_message_id
+
+    async def _command_history(
+        self, args: HistoryArgs, session_id: tuple
     ) -> None:
         """
-        Команда отправки предупреждения пользователю
+        Команда постраничного вывода истории публичного или приватного чата
         """
-        if not self._is_login(session_id):
-            text = 'The command is not available to unregistered users'
+        peer = args.peer
+        if not peer:
+            text = 'Conversation is not specified'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
-        if not tokens:
+        if peer != HISTORY_PUBLIC_ID and peer not in self.users:
+            text = f'User {peer} does not exist'
+            logger.info(text)
+            await self._write_message(self._sessions[session_id].writer, text)
+            return
+
+        try:
+            before, after, limit = self._parse_history_params(args.params)
+        except ValueError:
+            text = 'Invalid history parameters'
+            logger.info(text)
+            await self._write_message(self._sessions[session_id].writer, text)
+            return
+
+        user_name = self._sessions[session_id].user_name
+        peer = None if peer == HISTORY_PUBLIC_ID else peer
+        stored = []
+        if peer in self._conversations.unread(user_name):
+            stored = await self._stored_messages(user_name, (peer,))
+        messages = self._iter_history(user_name, peer, before, after, stored)
+        text = ''.join(map(self._format_message, islice(messages, limit)))
+        if not text:
+            text = 'No messages'
+        logger.info(f'Send history of {args.peer} to {user_name}')
+        await self._write_message(self._sessions[session_id].writer, text)
+
+    async def _command_search(
+        self, args: SearchArgs, session_id: tuple
+    ) -> None:
+        """
+        Команда поиска по доступным пользователю сообщениям
+        """
+        if not args.query:
+            text = 'No search query'
+            logger.info(text)
+            await self._write_message(self._sessions[session_id].writer, text)
+            return
+
+        user_name = self._sessions[session_id].user_name
+        messages = self._search_index.search(
+            args.query, (PUBLIC_ID, user_name), SEARCH_RESULTS_LIMIT
+        )
+        stored = await self._search_stored(user_name, args.query)
+        if stored:
+            messages = islice(
+                heapq.merge(
+                    messages, stored, key=attrgetter('id'), reverse=True
+                ),
+                SEARCH_RESULTS_LIMIT,
+            )
+        text = ''.join(map(self._format_message, messages))
+        if not text:
+            text = 'No messages'
+        logger.info(f'Send search results for {user_name}')
+        await self._write_message(self._sessions[session_id].writer, text)
+
+    async def _search_stored(
+        self, user_name: str, query: str
+    ) -> list[Message]:
+        """
+        Поиск среди сообщений пользователя, хранящихся во входящих
+        получателей на диске (от новых к старым)
+        """
+        tokens = tokenize(query)
+        if not tokens or not self._mailbox:
+            return []
+
+        stored = await self._stored_messages(
+            user_name, self._conversations.unread(user_name)
+        )
+        return [
+            message
+            for message in reversed(stored)
+            if tokens <= tokenize(message.text)
+        ]
+
+    async def _stored_messages(
+        self, sender: str, recipients: Iterable[str]
+    ) -> list[Message]:
+        """
+        Сообщения отправителя, хранящиеся во входящих получателей на диске,
+        по возрастанию id. Такие сообщения не прочитаны, поэтому получатели
+        берутся из счётчиков непрочитанных
+        """
+        if not self._mailbox:
+            return []
+
+        messages = []
+        for recipient in recipients:
+            messages += await self._mailbox_io(
+                recipient, self._mailbox.read_from, recipient, sender
+            )
+        messages.sort(key=attrgetter('id'))
+        return messages
+
+    async def _command_unread(self, session_id: tuple) -> None:
+        """
+        Команда вывода количества отправленных пользователем сообщений,
+        ещё не прочитанных получателями
+        """
+        user_name = self._sessions[session_id].user_name
+        text = ''.join(
+            f'To: {recipient} Unread: {num}\n'
+            for recipient, num in sorted(
+                self._conversations.unread(user_name).items()
+            )
+        )
+        if not text:
+            text = 'No unread messages'
+        await self._write_message(self._sessions[session_id].writer, text)
+
+    @staticmethod
+    def _parse_history_params(
+        params: list[str],
+    ) -> tuple[int | None, int | None, int]:
+        """
+        Разбор параметров истории: before <id>, after <id>, limit <n>
+        """
+        if len(params) % 2:
+            raise ValueError('Parameter without value')
+
+        values = {}
+        for name, value in zip(params[::2], params[1::2]):
+            if name not in ('before', 'after', 'limit') or name in values:
+                raise ValueError(f'Unexpected parameter {name}')
+            values[name] = int(value)
+
+        if 'before' in values and 'after' in values:
+            raise ValueError('Both before and after are specified')
+
+        limit = values.get('limit', HISTORY_LIMIT_DEFAULT)
+        if not 0 < limit <= HISTORY_LIMIT_MAX:
+            raise ValueError(f'Limit is out of range: {limit}')
+
+        return values.get('before'), values.get('after'), limit
+
+    def _iter_history(
+        self,
+        user_name: str,
+        peer: str | None,
+        before: int | None,
+        after: int | None,
+        stored: list[Message] | None = None,
+    ) -> Iterator[Message]:
+        """
+        Ленивый обход истории публичного чата (peer is None) или переписки
+        с пользователем peer. С курсором after сообщения идут по возрастанию
+        id, иначе - от новых к старым. stored - отправленные пользователем
+        сообщения из входящих peer на диске
+        """
+        if peer is None:
+            return self._iter_messages(self.public_messages, before, after)
+
+        incoming = self._iter_messages(
+            self._conversations.messages(peer, user_name), before, after
+        )
+        if peer == user_name:
+            return incoming
+
+        outgoing = self._conversations.messages(user_name, peer)
+        if stored:
+            outgoing = sorted([*outgoing, *stored], key=attrgetter('id'))
+        outgoing = self._iter_messages(outgoing, before, after)
+        return heapq.merge(
+            incoming, outgoing, key=attrgetter('id'), reverse=after is None
+        )
+
+    @staticmethod
+    def _iter_messages(
+        messages: list[Message], before: int | None, after: int | None
+    ) -> Iterator[Message]:
+        """
+        Ленивый обход упорядоченного по id списка сообщений от курсора
+        """
+        key = attrgetter('id')
+        if after is not None:
+            start = bisect_right(messages, after, key=key)
+            return (messages[i] for i in range(start, len(messages)))
+
+        end = (
+            len(messages)
+            if before is None
+            else bisect_left(messages, before, key=key)
+        )
+        return (messages[i] for i in range(end - 1, -1, -1))
+
+    async def _command_ban_user(
+        self, user_name: str | None, session_id: tuple
+    ) -> None:
+        """
+        Команда отправки предупреждения пользователю
+        """
+        if not user_name:
             text = 'User is not specified'
             logger.info(text)
             await self._write_message(self._sessions[session_id].writer, text)
             return
 
-        user_name = tokens[0].split(maxsplit=1)[0]
         if user_name not in self.users:
             text = f'User {user_name} does not exist'
             logger.info(text)
@@ -542,20 +1356,96 @@ class Server:
         """
         Сохранение данных сервера
         """
-        with open(STATE_FILE, 'wb') as file:
+        self._dump_state(STATE_FILE)
+        logger.info('Server save state')
+
+    def _dump_state(self, path: str) -> None:
+        """
+        Атомарная запись данных сервера: во временный файл с последующим
+        переименованием
+        """
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
             pickle.dump(
-                (self.users, self.private_messages, self.public_messages),
+                (
+                    self.users,
+                    self.private_messages,
+                    self.public_messages,
+                    self._last_message_id,
+                    self._search_index,
+                ),
                 file,
             )
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
 
-        logger.info('Server save state')
+    def _latest_state_path(self) -> str:
+        """
+        Самый новый по времени изменения из файла состояния и последней
+        контрольной точки. После аварийной остановки файл состояния от
+        прежней штатной остановки старше контрольных точек
+        """
+        checkpoints = self._checkpoints()
+        if not checkpoints:
+            return STATE_FILE
+        if not os.path.exists(STATE_FILE):
+            return checkpoints[-1]
+        if os.path.getmtime(checkpoints[-1]) > os.path.getmtime(STATE_FILE):
+            return checkpoints[-1]
+        return STATE_FILE
+
+    def _upgrade_legacy_state(self) -> None:
+        """
+        Состояние прежнего формата без id сообщений: id назначаются по
+        времени создания, индекс поиска строится заново
+        """
+        messages = [
+            (message, (PUBLIC_ID,)) for message in self.public_messages
+        ]
+        for recipient_messages in self.private_messages.values():
+            messages.extend(
+                (message, (message.sender, message.recipient))
+                for message in recipient_messages
+            )
+        messages.sort(key=lambda item: item[0].create_at)
+
+        self._last_message_id = 0
+        self._search_index = SearchIndex()
+        for message, scope in messages:
+            message.id = self._next_message_id()
+            self._search_index.add(message, scope)
+
+        key = attrgetter('id')
+        self.public_messages.sort(key=key)
+        for recipient_messages in self.private_messages.values():
+            recipient_messages.sort(key=key)
 
     def _load_data(self) -> None:
         """
-        Восстановление данных сервера
+        Восстановление данных сервера из самого нового из файла состояния
+        и последней контрольной точки
         """
-        with open(STATE_FILE, 'rb') as file:
-            self.users, self.private_messages, self.public_messages = (
-                pickle.load(file)
-            )
+        with open(self._latest_state_path(), 'rb') as file:
+            state = pickle.load(file)
+        if len(state) == LEGACY_STATE_LEN:
+            self.users, self.private_messages, self.public_messages = state
+            self._upgrade_legacy_state()
+        else:
+            (
+                self.users,
+                self.private_messages,
+                self.public_messages,
+                self._last_message_id,
+                self._search_index,
+            ) = state
+        for messages in self.private_messages.values():
+            for message in messages:
+                self._memory.add(message)
+                self._conversations.add(message)
+        if self._mailbox:
+            for user_name in self._mailbox.users():
+                for message in self._mailbox.read(user_name):
+                    self._memory.add(message)
+                    self._conversations.add(message, stored=False)
         logger.info('Server load state')
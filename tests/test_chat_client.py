@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from chat_client import ChatClient, ChatClientPool, CommandError
+from server import Server
+
+
+class TestChatClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.tcp_server = await asyncio.start_server(
+            self.server._client_handler, '127.0.0.1', 0
+        )
+        self.port = self.tcp_server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.tcp_server.close()
+        await self.tcp_server.wait_closed()
+
+    async def test_send_and_receive(self):
+        async with ChatClient(port=self.port) as client1, ChatClient(
+            port=self.port
+        ) as client2:
+            await client1.login('user1')
+            await client2.login('user2')
+            message_id = await client1.send('user2', 'hello there')
+
+            message = await asyncio.wait_for(anext(client2), 1)
+            self.assertEqual(message.id, message_id)
+            self.assertEqual(message.sender, 'user1')
+            self.assertEqual(message.text, 'hello there')
+
+    async def test_pipelining(self):
+        async with ChatClient(port=self.port) as client:
+            await client.login('user1')
+            ids = await asyncio.gather(
+                *(client.send('user1', f'message {i}') for i in range(50))
+            )
+        self.assertEqual(ids, list(range(1, 51)))
+
+    async def test_command_error(self):
+        async with ChatClient(port=self.port) as client:
+            await client.login('user1')
+            with self.assertRaisesRegex(CommandError, 'does not exist'):
+                await client.send('no_user', 'hello')
+            self.assertEqual(await client.send_all('hello'), 1)
+
+    async def test_iteration_stops_on_close(self):
+        client = ChatClient(port=self.port)
+        await client.connect()
+        await client.login('user1')
+        await client.close()
+        messages = [message async for message in client]
+        self.assertEqual(messages, [])
+
+    async def test_pool(self):
+        pool = ChatClientPool(port=self.port, max_connections=2)
+        await pool.send('user1', 'user1', 'first')
+        await pool.send('user2', 'user1', 'second')
+        await pool.send('user3', 'user1', 'third')
+        self.assertEqual(list(pool._clients), ['user2', 'user3'])
+
+        async with pool.acquire('user2'), pool.acquire('user3'):
+            task = asyncio.create_task(pool.send('user4', 'user1', 'fourth'))
+            await asyncio.sleep(0.05)
+            self.assertFalse(task.done())
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(len(pool._clients), 2)
+        await pool.close()
+
+        messages = self.server.private_messages['user1']
+        self.assertEqual(
+            [m.text for m in messages], ['first', 'second', 'third', 'fourth']
+        )
+
+    async def test_pool_login_outside_lock(self):
+        pool = ChatClientPool(port=self.port, max_connections=2)
+        await pool.send('user1', 'user1', 'first')
+        login = ChatClient.login
+        started, resume = asyncio.Event(), asyncio.Event()
+
+        async def slow_login(client, user_name):
+            started.set()
+            await resume.wait()
+            await login(client, user_name)
+
+        with patch.object(ChatClient, 'login', slow_login):
+            task = asyncio.create_task(pool.send('user2', 'user1', 'second'))
+            await started.wait()
+            await asyncio.wait_for(pool.send('user1', 'user1', 'third'), 1)
+            resume.set()
+            await asyncio.wait_for(task, 1)
+        await pool.close()
+
+        messages = self.server.private_messages['user1']
+        self.assertEqual(
+            [m.text for m in messages], ['first', 'third', 'second']
+        )
+
+    async def test_pool_connect_failure(self):
+        self.tcp_server.close()
+        await self.tcp_server.wait_closed()
+        pool = ChatClientPool(port=self.port, max_connections=1)
+        with self.assertRaises(OSError):
+            await pool.send('user1', 'user1', 'first')
+        self.assertEqual(pool._clients, {})
+        self.assertEqual(pool._in_use, {})
+        self.assertEqual(pool._connecting, set())
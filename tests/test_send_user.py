@@ -34,28 +34,30 @@ class TestServerCommandSendUser(unittest.IsolatedAsyncioTestCase):
         )
 
     async def test_command_send_private_no_recipient(self):
-        await self.server._command_send_user([], self.session_id1)
+        await self.server._command(b'send', self.session_id1)
         self.writer_mock.write.assert_called_once_with(
-            NO_RECIPIENT_WARNING.encode()
+            f'{NO_RECIPIENT_WARNING}\n'.encode()
         )
 
     async def test_command_send_private_recipient_not_exist(self):
-        await self.server._command_send_user([NO_USER], self.session_id1)
+        await self.server._command(
+            f'send {NO_USER}'.encode(), self.session_id1
+        )
         self.writer_mock.write.assert_called_once_with(
-            RECIPIENT_NOT_EXIST_WARNING.encode()
+            f'{RECIPIENT_NOT_EXIST_WARNING}\n'.encode()
         )
 
     async def test_command_send_user_no_text(self):
-        await self.server._command_send_user(
-            [self.user2.name], self.session_id1
+        await self.server._command(
+            f'send {self.user2.name}'.encode(), self.session_id1
         )
         self.writer_mock.write.assert_called_once_with(
-            NO_MESSAGE_WARNING.encode()
+            f'{NO_MESSAGE_WARNING}\n'.encode()
         )
 
     async def test_command_send_all(self):
-        await self.server._command_send_user(
-            [f'{self.user2.name} {MESSAGE_TEXT}'], self.session_id1
+        await self.server._command(
+            f'send {self.user2.name} {MESSAGE_TEXT}'.encode(), self.session_id1
         )
         print(self.server.private_messages)
         self.assertEqual(len(self.server.private_messages[self.user2.name]), 1)
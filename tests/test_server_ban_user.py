@@ -32,28 +32,30 @@ class TestServerCommandBanUser(unittest.IsolatedAsyncioTestCase):
         )
 
     async def test_command_ban_user_no_user(self):
-        await self.server._command_ban_user([], self.session_id1)
+        await self.server._command(b'ban', self.session_id1)
         self.writer_mock.write.assert_called_once_with(
-            NO_USER_WARNING.encode()
+            f'{NO_USER_WARNING}\n'.encode()
         )
 
     async def test_command_ban_user_not_exist(self):
-        await self.server._command_send_user([NO_USER], self.session_id1)
+        await self.server._command(
+            f'send {NO_USER}'.encode(), self.session_id1
+        )
         self.writer_mock.write.assert_called_once_with(
-            USER_NOT_EXIST_WARNING.encode()
+            f'{USER_NOT_EXIST_WARNING}\n'.encode()
         )
 
     async def test_command_ban_user(self):
         self.assertEqual(self.user2.ban_num, 0)
-        await self.server._command_ban_user(
-            [f'{self.user2.name}'], self.session_id1
+        await self.server._command(
+            f'ban {self.user2.name}'.encode(), self.session_id1
         )
         self.assertEqual(self.user2.ban_num, 1)
 
     async def test_is_ban(self):
         self.assertEqual(self.user2.ban_num, 0)
         for i in range(BAN_LIMIT_NUM):
-            await self.server._command_ban_user(
-                [f'{self.user2.name}'], self.session_id1
+            await self.server._command(
+                f'ban {self.user2.name}'.encode(), self.session_id1
             )
         self.assertTrue(self.server._is_ban(self.user2.name))
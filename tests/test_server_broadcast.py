@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from server import Server, User
+
+BROADCAST_WINDOW_SEC = 0.01
+
+
+class TestServerBroadcastCoalescing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server(
+            broadcast_window_sec=BROADCAST_WINDOW_SEC, broadcast_batch_size=3
+        )
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock1 = MagicMock(spec=StreamWriter)
+        self.writer_mock2 = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.user2 = User(name='user2')
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock1, user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=self.writer_mock2, user_name=self.user2.name
+        )
+
+    async def test_broadcast_window(self):
+        await self.server._command(b'send_all first', self.session_id1)
+        await self.server._command(b'send_all second', self.session_id2)
+        self.writer_mock1.write.assert_not_called()
+        self.writer_mock2.write.assert_not_called()
+
+        await asyncio.sleep(BROADCAST_WINDOW_SEC * 5)
+        for writer_mock in (self.writer_mock1, self.writer_mock2):
+            writer_mock.write.assert_called_once()
+            text = writer_mock.write.call_args.args[0].decode()
+            self.assertEqual(len(text.splitlines()), 2)
+            self.assertIn('Text: first', text)
+            self.assertIn('Text: second', text)
+        self.assertIsNone(self.server._broadcast_task)
+
+    async def test_broadcast_batch_size(self):
+        for i in range(3):
+            await self.server._command(
+                f'send_all {i}'.encode(), self.session_id1
+            )
+
+        self.writer_mock1.write.assert_called_once()
+        self.writer_mock2.write.assert_called_once()
+        self.assertIsNone(self.server._broadcast_task)
+        self.assertEqual(self.server._broadcast_texts, [])
+
+    async def test_broadcast_without_window(self):
+        self.server.broadcast_window_sec = 0
+        await self.server._command(b'send_all first', self.session_id1)
+        await self.server._command(b'send_all second', self.session_id1)
+        self.assertEqual(self.writer_mock1.write.call_count, 2)
+        self.assertEqual(self.writer_mock2.write.call_count, 2)
+
+    async def test_broadcast_flush_on_stop(self):
+        await self.server._command(b'send_all first', self.session_id1)
+        self.server._delete_read_messages_task = MagicMock()
+        self.server._reset_limit_sent_messages_task = MagicMock()
+        self.server._server_task = MagicMock()
+        self.server._event.set()
+        await self.server._stop_server()
+
+        for writer_mock in (self.writer_mock1, self.writer_mock2):
+            writer_mock.write.assert_called_once()
+            text = writer_mock.write.call_args.args[0].decode()
+            self.assertIn('Text: first', text)
+        self.assertIsNone(self.server._broadcast_task)
@@ -0,0 +1,133 @@
+import os
+import pickle
+import tempfile
+import unittest
+from asyncio.streams import StreamWriter
+from collections import defaultdict
+from unittest.mock import MagicMock, patch
+
+from config import logger
+from server import Message, Server, User
+
+CHECKPOINT_KEEP_NUM = 2
+
+
+class TestServerCheckpoint(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_dir = os.path.join(self.tmp_dir.name, 'checkpoints')
+        self.server = Server(
+            checkpoint_dir=self.checkpoint_dir,
+            checkpoint_keep_num=CHECKPOINT_KEEP_NUM,
+        )
+        self.session_id = ('127.0.0.1', 12345)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.server.users = {self.user1.name: self.user1}
+        self.server._sessions[self.session_id] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+
+    async def asyncTearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_checkpoint_retention(self):
+        for i in range(CHECKPOINT_KEEP_NUM + 2):
+            await self.server._command(
+                f'send_all {i}'.encode(), self.session_id
+            )
+            await self.server._checkpoint()
+
+        checkpoints = self.server._checkpoints()
+        self.assertEqual(len(checkpoints), CHECKPOINT_KEEP_NUM)
+        tmp_files = [
+            name
+            for name in os.listdir(self.checkpoint_dir)
+            if name.endswith('.tmp')
+        ]
+        self.assertEqual(tmp_files, [])
+
+    async def test_checkpoint_keep_num_validation(self):
+        with self.assertRaises(ValueError):
+            Server(checkpoint_dir=self.checkpoint_dir, checkpoint_keep_num=0)
+
+    async def test_checkpoint_child_logs_error(self):
+        with (
+            patch('server.os.fork', return_value=0),
+            patch('server.os._exit', side_effect=SystemExit) as exit_mock,
+            patch.object(
+                self.server, '_dump_state', side_effect=OSError('disk full')
+            ),
+            self.assertLogs(logger, 'ERROR') as logs,
+            self.assertRaises(SystemExit),
+        ):
+            await self.server._checkpoint()
+        exit_mock.assert_called_once_with(1)
+        self.assertIn('disk full', logs.output[0])
+
+    async def test_restore_from_checkpoint(self):
+        await self.server._command(b'send_all message', self.session_id)
+        await self.server._checkpoint()
+
+        state_file = os.path.join(self.tmp_dir.name, 'server_data.pickle')
+        with patch('server.STATE_FILE', state_file):
+            server = Server(
+                restore_data=True, checkpoint_dir=self.checkpoint_dir
+            )
+        self.assertEqual(server.public_messages[0].text, 'message')
+        self.assertEqual(server._last_message_id, 1)
+        self.assertEqual(len(server._search_index), 1)
+
+    async def test_restore_newest_of_state_file_and_checkpoint(self):
+        state_file = os.path.join(self.tmp_dir.name, 'server_data.pickle')
+        await self.server._command(b'send_all old', self.session_id)
+        self.server._dump_state(state_file)
+        os.utime(state_file, (0, 0))
+        await self.server._command(b'send_all new', self.session_id)
+        await self.server._checkpoint()
+
+        with patch('server.STATE_FILE', state_file):
+            server = Server(
+                restore_data=True, checkpoint_dir=self.checkpoint_dir
+            )
+        self.assertEqual(len(server.public_messages), 2)
+
+        self.server._dump_state(state_file)
+        os.utime(self.server._checkpoints()[-1], (0, 0))
+        await self.server._command(b'send_all latest', self.session_id)
+        self.server._dump_state(state_file)
+        with patch('server.STATE_FILE', state_file):
+            server = Server(
+                restore_data=True, checkpoint_dir=self.checkpoint_dir
+            )
+        self.assertEqual(len(server.public_messages), 3)
+
+    async def test_restore_legacy_state(self):
+        private_message = Message(
+            sender='user1', recipient='user2', text='private', create_at=2
+        )
+        public_messages = [
+            Message(sender='user1', text='first', create_at=1),
+            Message(sender='user1', text='third', create_at=3),
+        ]
+        state_file = os.path.join(self.tmp_dir.name, 'server_data.pickle')
+        with open(state_file, 'wb') as file:
+            pickle.dump(
+                (
+                    {'user1': User(name='user1'), 'user2': User(name='user2')},
+                    defaultdict(list, {'user2': [private_message]}),
+                    public_messages,
+                ),
+                file,
+            )
+
+        with patch('server.STATE_FILE', state_file):
+            server = Server(
+                restore_data=True, checkpoint_dir=self.checkpoint_dir
+            )
+        self.assertEqual([m.id for m in server.public_messages], [1, 3])
+        self.assertEqual(server.private_messages['user2'][0].id, 2)
+        self.assertEqual(server._last_message_id, 3)
+        self.assertEqual(len(server._search_index), 3)
+        messages = server._conversations.messages('user1', 'user2')
+        self.assertEqual([m.id for m in messages], [2])
@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from server import COMMAND_OVERHEAD_BYTES, Server
+
+TOO_LONG_WARNING = 'Command is too long'
+
+
+class TestServerClientHandler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.writer_mock.get_extra_info.return_value = ('127.0.0.1', 12345)
+        self.writer_mock.is_closing.return_value = True
+
+    def _output(self) -> str:
+        return b''.join(
+            call.args[0] for call in self.writer_mock.write.call_args_list
+        ).decode()
+
+    async def test_too_long_command_skipped(self):
+        reader = asyncio.StreamReader(limit=32)
+        task = asyncio.create_task(
+            self.server._client_handler(reader, self.writer_mock)
+        )
+        reader.feed_data(b'login user1\nsend_all ' + b'x' * 100)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        reader.feed_data(b' and the tail\nsend_all ok\n')
+        reader.feed_eof()
+        await asyncio.wait_for(task, 1)
+
+        self.assertEqual(
+            [message.text for message in self.server.public_messages], ['ok']
+        )
+        self.assertIn(TOO_LONG_WARNING, self._output())
+        self.assertNotIn('not found', self._output())
+
+    async def test_too_long_command_in_buffer(self):
+        reader = asyncio.StreamReader(limit=32)
+        reader.feed_data(
+            b'login user1\nsend_all ' + b'x' * 100 + b'\nsend_all ok\n'
+        )
+        reader.feed_eof()
+        await self.server._client_handler(reader, self.writer_mock)
+
+        self.assertEqual(
+            [message.text for message in self.server.public_messages], ['ok']
+        )
+        self.assertIn(TOO_LONG_WARNING, self._output())
+
+    async def test_read_limit_from_message_size(self):
+        self.server = Server(max_message_bytes=10)
+        self.assertEqual(self.server.read_limit, 10 + COMMAND_OVERHEAD_BYTES)
+        reader = asyncio.StreamReader(limit=self.server.read_limit)
+        reader.feed_data(
+            b'login user1\nsend_all '
+            + b'x' * self.server.read_limit
+            + b'\nsend_all ' + b'y' * 11
+            + b'\nsend_all ok\n'
+        )
+        reader.feed_eof()
+        await self.server._client_handler(reader, self.writer_mock)
+
+        self.assertEqual(
+            [message.text for message in self.server.public_messages], ['ok']
+        )
+        self.assertIn(TOO_LONG_WARNING, self._output())
+        self.assertIn('Message is too large', self._output())
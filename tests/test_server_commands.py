@@ -0,0 +1,83 @@
+import time
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from commands import HistoryArgs, SendArgs, parse_history, parse_send
+from server import MESSAGES_PER_INTERVAL_LIMIT, Server, User
+
+NOT_LOGIN_WARNING = 'The command is not available to unregistered users'
+NOT_ADMIN_WARNING = 'The command is available to administrators only'
+
+
+class TestServerCommands(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.server.users = {self.user1.name: self.user1}
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=self.writer_mock, user_name=None
+        )
+
+    async def test_command_not_found(self):
+        await self.server._command(b'unknown args', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            b'Command not found: unknown\n'
+        )
+
+    async def test_not_login(self):
+        await self.server._command(b'send_all message', self.session_id2)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NOT_LOGIN_WARNING}\n'.encode()
+        )
+        self.assertEqual(self.server.public_messages, [])
+
+    async def test_not_admin(self):
+        await self.server._command(b'memory', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NOT_ADMIN_WARNING}\n'.encode()
+        )
+
+    async def test_ban_blocks_sending_only(self):
+        self.user1.ban_time = time.time() + 60
+        await self.server._command(b'send_all message', self.session_id1)
+        self.assertIn(
+            b'cannot send messages', self.writer_mock.write.call_args.args[0]
+        )
+        await self.server._command(b'history all', self.session_id1)
+        self.writer_mock.write.assert_called_with(b'No messages\n')
+
+    async def test_duplicate_checked_before_rate_limit(self):
+        await self.server._command(b'send_all:c1 message', self.session_id1)
+        self.user1.messages_sent_per_hour_num = MESSAGES_PER_INTERVAL_LIMIT
+        self.writer_mock.reset_mock()
+
+        await self.server._command(b'send_all:c1 message', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(b'Ack: c1 Id: 1\n')
+        await self.server._command(b'send_all:c2 message', self.session_id1)
+        self.assertIn(
+            b'cannot send messages', self.writer_mock.write.call_args.args[0]
+        )
+        self.assertEqual(len(self.server.public_messages), 1)
+
+
+class TestCommandParsers(unittest.TestCase):
+    def test_parse_send(self):
+        self.assertEqual(
+            parse_send(b'user2  hello  there'),
+            SendArgs('user2', 'hello  there'),
+        )
+        self.assertEqual(parse_send(b'user2'), SendArgs('user2', None))
+        self.assertEqual(parse_send(b''), SendArgs(None, None))
+
+    def test_parse_history(self):
+        self.assertEqual(
+            parse_history(b'all limit 2'), HistoryArgs('all', ['limit', '2'])
+        )
+        self.assertEqual(parse_history(b''), HistoryArgs(None, []))
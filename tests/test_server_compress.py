@@ -0,0 +1,125 @@
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from compression import (
+    COMPRESSION_ACK,
+    FRAME_DEFLATE,
+    FRAME_RAW,
+    CompressedWriter,
+    FrameDecoder,
+    frame_header,
+    parse_frame_header,
+)
+from server import Message, Server, Session, User
+
+UNSUPPORTED_WARNING = 'Supported compression: zlib'
+
+
+class TestServerCommandCompress(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.server.users = {self.user1.name: self.user1}
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=MagicMock(spec=StreamWriter), user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = Session(
+            writer=self.writer_mock
+        )
+
+    def _frames(self) -> bytes:
+        data = b''.join(
+            call.args[0] for call in self.writer_mock.write.call_args_list
+        )
+        return data[len(COMPRESSION_ACK):]
+
+    async def test_command_compress_unsupported(self):
+        await self.server._command(b'compress gzip', self.session_id2)
+        self.writer_mock.write.assert_called_once_with(
+            f'{UNSUPPORTED_WARNING}\n'.encode()
+        )
+
+    async def test_command_compress(self):
+        await self.server._command(b'compress zlib', self.session_id2)
+        self.writer_mock.write.assert_called_once_with(
+            COMPRESSION_ACK.encode()
+        )
+        self.assertIsInstance(
+            self.server._sessions[self.session_id2].writer, CompressedWriter
+        )
+
+    async def test_login_replay_compressed(self):
+        self.server.public_messages = [
+            Message(
+                sender=self.user1.name,
+                text=f'public message {i} for new users',
+                create_at=0,
+            )
+            for i in range(100)
+        ]
+        await self.server._command(b'compress zlib', self.session_id2)
+        await self.server._command(b'login user2', self.session_id2)
+
+        frames = self._frames()
+        kind, size, start = parse_frame_header(frames)
+        self.assertEqual(kind, FRAME_DEFLATE)
+        self.assertEqual(len(frames), start + size)
+        replay = b''.join(FrameDecoder().feed(frames)).decode()
+        self.assertEqual(len(replay.splitlines()), 20)
+        self.assertIn('Text: public message 99 for new users', replay)
+
+
+class TestCompressedWriter(unittest.TestCase):
+    def test_small_and_large_writes(self):
+        writer_mock = MagicMock(spec=StreamWriter)
+        writer = CompressedWriter(writer_mock, threshold=100)
+        small = b'From: user1 To: user2 Text: hi\n'
+        large = small * 50
+        writer.write(small)
+        writer.write(large)
+        writer.write(large)
+
+        data = b''.join(
+            call.args[0] for call in writer_mock.write.call_args_list
+        )
+        self.assertTrue(data.startswith(small + bytes((FRAME_DEFLATE,))))
+        self.assertLess(len(data), len(small) + 2 * len(large))
+
+        decoder = FrameDecoder()
+        chunks = [
+            chunk
+            for i in range(0, len(data), 7)
+            for chunk in decoder.feed(data[i:i + 7])
+        ]
+        self.assertEqual(chunks, [small, large, large])
+
+    def test_raw_frames(self):
+        writer_mock = MagicMock(spec=StreamWriter)
+        writer = CompressedWriter(writer_mock)
+        chunks = [b'line 1\nline 2\n', b'\x00text\n', b'a\n\x01b\n', b'tail']
+        for chunk in chunks:
+            writer.write(chunk)
+
+        data = b''.join(
+            call.args[0] for call in writer_mock.write.call_args_list
+        )
+        self.assertEqual(
+            data[len(chunks[0]):][:2], frame_header(FRAME_RAW, len(chunks[1]))
+        )
+        self.assertEqual(
+            list(FrameDecoder().feed(data)),
+            [b'line 1\n', b'line 2\n', *chunks[1:]],
+        )
+
+    def test_frame_header(self):
+        for size in (0, 127, 128, 300, 1 << 20):
+            header = frame_header(FRAME_DEFLATE, size)
+            self.assertEqual(
+                parse_frame_header(header + b'data'),
+                (FRAME_DEFLATE, size, len(header)),
+            )
+            self.assertIsNone(parse_frame_header(header[:-1]))
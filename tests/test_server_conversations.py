@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from conversations import ConversationIndex
+from mailbox_store import MailboxStore
+from server import Message, Server, User
+
+NO_UNREAD_TEXT = 'No unread messages'
+
+
+class TestServerConversations(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = Server()
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1', session=self.session_id1)
+        self.user2 = User(name='user2', exit_time=0)
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=MagicMock(spec=StreamWriter), user_name=None
+        )
+
+    async def asyncTearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def _send(self, text: str) -> None:
+        await self.server._command(
+            f'send {self.user2.name} {text}'.encode(), self.session_id1
+        )
+
+    async def test_command_unread(self):
+        await self._send('first')
+        await self._send('second')
+        self.writer_mock.reset_mock()
+        await self.server._command(b'unread', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            b'To: user2 Unread: 2\n'
+        )
+
+        await self.server._command(b'login user2', self.session_id2)
+        await self.server._command(b'unread', self.session_id1)
+        self.writer_mock.write.assert_called_with(
+            f'{NO_UNREAD_TEXT}\n'.encode()
+        )
+
+    async def test_forget_message(self):
+        await self._send('first')
+        await self._send('second')
+        message = self.server.private_messages[self.user2.name].pop(0)
+        self.server._forget_private_message(message)
+
+        messages = self.server._conversations.messages('user1', 'user2')
+        self.assertEqual([m.id for m in messages], [2])
+        self.assertEqual(
+            self.server._conversations.unread('user1'), {'user2': 1}
+        )
+
+    async def test_mailbox_messages(self):
+        self.server._mailbox = MailboxStore(self.tmp_dir.name)
+        await self._send('first')
+        self.assertEqual(
+            self.server._conversations.messages('user1', 'user2'), []
+        )
+        self.assertEqual(
+            self.server._conversations.unread('user1'), {'user2': 1}
+        )
+
+        await self.server._command(b'login user2', self.session_id2)
+        messages = self.server._conversations.messages('user1', 'user2')
+        self.assertEqual([m.text for m in messages], ['first'])
+        self.assertEqual(self.server._conversations.unread('user1'), {})
+
+
+class TestConversationIndex(unittest.TestCase):
+    def test_store_keeps_id_order(self):
+        index = ConversationIndex()
+        for message_id in (1, 5, 3):
+            index.add(
+                Message(
+                    sender='user1',
+                    recipient='user2',
+                    text='text',
+                    create_at=0,
+                    id=message_id,
+                )
+            )
+        messages = index.messages('user1', 'user2')
+        self.assertEqual([m.id for m in messages], [1, 3, 5])
+        self.assertEqual(index.messages('user2', 'user1'), [])
+        self.assertEqual(len(index), 3)
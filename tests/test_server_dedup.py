@@ -0,0 +1,110 @@
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock, patch
+
+from dedup import DedupWindow
+from server import Server, User
+
+MESSAGE_TEXT = 'message text'
+NO_MESSAGE_WARNING = 'No message text'
+
+
+class TestServerDedup(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1', session=self.session_id1)
+        self.user2 = User(name='user2')
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+
+    async def test_send_all_duplicate(self):
+        for _ in range(2):
+            await self.server._command(
+                f'send_all:c1 {MESSAGE_TEXT}'.encode(), self.session_id1
+            )
+        self.assertEqual(len(self.server.public_messages), 1)
+        self.assertEqual(self.server.public_messages[0].text, MESSAGE_TEXT)
+        self.assertEqual(self.user1.messages_sent_per_hour_num, 1)
+
+        written = [
+            call.args[0] for call in self.writer_mock.write.call_args_list
+        ]
+        self.assertEqual(written.count(b'Ack: c1 Id: 1\n'), 2)
+        self.assertEqual(len(written), 3)
+
+    async def test_send_user_duplicate(self):
+        for _ in range(2):
+            await self.server._command(
+                f'send:c1 {self.user2.name} {MESSAGE_TEXT}'.encode(),
+                self.session_id1,
+            )
+        await self.server._command(
+            f'send:c2 {self.user2.name} {MESSAGE_TEXT}'.encode(),
+            self.session_id1,
+        )
+        messages = self.server.private_messages[self.user2.name]
+        self.assertEqual([m.id for m in messages], [1, 2])
+        self.writer_mock.write.assert_called_with(b'Ack: c2 Id: 2\n')
+
+    async def test_send_without_client_id(self):
+        await self.server._command(
+            f'send_all {MESSAGE_TEXT}'.encode(), self.session_id1
+        )
+        await self.server._command(
+            f'send_all {MESSAGE_TEXT}'.encode(), self.session_id1
+        )
+        self.assertEqual(len(self.server.public_messages), 2)
+
+    async def test_send_all_client_id_without_text(self):
+        await self.server._command(b'send_all:c1', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NO_MESSAGE_WARNING}\n'.encode()
+        )
+
+
+    async def test_text_starting_with_id_prefix(self):
+        await self.server._command(
+            b'send_all id:42 is the answer', self.session_id1
+        )
+        self.assertEqual(
+            self.server.public_messages[0].text, 'id:42 is the answer'
+        )
+        self.assertNotIn(
+            b'Ack', self.writer_mock.write.call_args.args[0]
+        )
+
+    async def test_invalid_client_id_tag(self):
+        for line in (b'send_all: message', b'ban:c1 user2'):
+            self.writer_mock.reset_mock()
+            await self.server._command(line, self.session_id1)
+            self.assertIn(
+                b'Command not found', self.writer_mock.write.call_args.args[0]
+            )
+        self.assertEqual(self.server.public_messages, [])
+
+class TestDedupWindow(unittest.TestCase):
+    def test_lru_eviction(self):
+        window = DedupWindow(size=2)
+        window.add('user1', 'a', 1)
+        window.add('user1', 'b', 2)
+        window.get('user1', 'a')
+        window.add('user1', 'c', 3)
+        self.assertEqual(window.get('user1', 'a'), 1)
+        self.assertIsNone(window.get('user1', 'b'))
+        self.assertIsNone(window.get('user2', 'a'))
+
+    def test_ttl(self):
+        window = DedupWindow(ttl_sec=10)
+        with patch('dedup.time.time', return_value=100):
+            window.add('user1', 'a', 1)
+        with patch('dedup.time.time', return_value=105):
+            self.assertEqual(window.get('user1', 'a'), 1)
+        with patch('dedup.time.time', return_value=111):
+            self.assertIsNone(window.get('user1', 'a'))
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from config import logger
+from diagnostics import _handle_run
+from server import Server, User
+
+NOT_ADMIN_WARNING = 'The command is available to administrators only'
+DISABLED_WARNING = 'Diagnostics is disabled'
+
+
+class TestServerDiagnostics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server(diagnostics=True, admins=['admin'])
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.admin = User(name='admin')
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.admin.name: self.admin,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=self.writer_mock, user_name=self.admin.name
+        )
+
+    async def test_command_timing(self):
+        await self.server._command(b'send_all message', self.session_id1)
+        await self.server._command(b'unknown', self.session_id1)
+        stats = self.server._diagnostics.command_stats
+        self.assertEqual(list(stats), ['send_all'])
+        self.assertEqual(stats['send_all'].count, 1)
+
+    async def test_command_timing_disabled(self):
+        self.server.diagnostics_enabled = False
+        await self.server._command(b'send_all message', self.session_id1)
+        self.assertEqual(self.server._diagnostics.command_stats, {})
+
+        self.writer_mock.reset_mock()
+        await self.server._command(b'stats', self.session_id2)
+        self.writer_mock.write.assert_called_once_with(
+            f'{DISABLED_WARNING}\n'.encode()
+        )
+
+    async def test_command_stats_not_admin(self):
+        await self.server._command(b'stats', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NOT_ADMIN_WARNING}\n'.encode()
+        )
+
+    async def test_command_stats(self):
+        await self.server._command(b'send_all message', self.session_id1)
+        self.writer_mock.reset_mock()
+        await self.server._command(b'stats', self.session_id2)
+        report = self.writer_mock.write.call_args.args[0].decode()
+        self.assertIn('Event loop lag', report)
+        self.assertIn('send_all: count 1', report)
+
+    async def test_lag_monitor(self):
+        self.server._diagnostics.lag_interval_sec = 0.01
+        task = asyncio.create_task(self.server._diagnostics.monitor_lag())
+        await asyncio.sleep(0)
+        time.sleep(0.05)
+        await asyncio.sleep(0.02)
+        task.cancel()
+        self.assertGreaterEqual(self.server._diagnostics.lag_max_sec, 0.03)
+
+    async def test_command_profile(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'profile.txt')
+            self.server._diagnostics.profile_file = path
+            await self.server._command(b'profile start', self.session_id2)
+            self.assertTrue(self.server._diagnostics.is_profiling)
+            time.sleep(0.05)
+            await self.server._command(b'profile stop', self.session_id2)
+            self.assertFalse(self.server._diagnostics.is_profiling)
+            with open(path) as file:
+                stats = file.read()
+        self.assertIn('test_command_profile', stats)
+
+    async def test_slow_callbacks(self):
+        diagnostics = self.server._diagnostics
+        diagnostics.enable_slow_callbacks()
+        try:
+            with self.assertLogs(logger, 'WARNING') as logs:
+                asyncio.get_running_loop().call_soon(time.sleep, 0.15)
+                await asyncio.sleep(0)
+        finally:
+            diagnostics.disable_slow_callbacks()
+        self.assertIn('Slow callback', logs.output[0])
+        self.assertIs(asyncio.Handle._run, _handle_run)
+
+    async def test_slow_callbacks_per_loop(self):
+        diagnostics = self.server._diagnostics
+        other = Server(diagnostics=True)._diagnostics
+        diagnostics.enable_slow_callbacks()
+        other.enable_slow_callbacks()
+        other_loop = asyncio.new_event_loop()
+        try:
+            diagnostics.disable_slow_callbacks()
+            with self.assertLogs(logger, 'WARNING') as logs:
+                asyncio.get_running_loop().call_soon(time.sleep, 0.15)
+                await asyncio.sleep(0)
+            self.assertEqual(len(logs.output), 1)
+
+            handle = asyncio.Handle(time.sleep, (0.15,), other_loop)
+            with self.assertNoLogs(logger, 'WARNING'):
+                handle._run()
+        finally:
+            other.disable_slow_callbacks()
+            other_loop.close()
+        self.assertIs(asyncio.Handle._run, _handle_run)
@@ -0,0 +1,105 @@
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from server import Server, User
+
+NO_CONVERSATION_WARNING = 'Conversation is not specified'
+INVALID_PARAMS_WARNING = 'Invalid history parameters'
+NO_MESSAGES_TEXT = 'No messages'
+
+
+class TestServerCommandHistory(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.user2 = User(name='user2')
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=self.writer_mock, user_name=self.user2.name
+        )
+
+    def _history_ids(self) -> list[int]:
+        output = self.writer_mock.write.call_args.args[0].decode()
+        return [int(line.split()[1]) for line in output.splitlines()]
+
+    async def test_command_history_no_conversation(self):
+        await self.server._command(b'history', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NO_CONVERSATION_WARNING}\n'.encode()
+        )
+
+    async def test_command_history_invalid_params(self):
+        await self.server._command(
+            b'history all before 1 after 2', self.session_id1
+        )
+        self.writer_mock.write.assert_called_once_with(
+            f'{INVALID_PARAMS_WARNING}\n'.encode()
+        )
+
+    async def test_command_history_empty(self):
+        await self.server._command(b'history all', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NO_MESSAGES_TEXT}\n'.encode()
+        )
+
+    async def test_command_history_public_pages(self):
+        for i in range(5):
+            await self.server._command(
+                f'send_all message {i}'.encode(), self.session_id1
+            )
+        self.writer_mock.reset_mock()
+
+        await self.server._command(b'history all limit 2', self.session_id1)
+        self.assertEqual(self._history_ids(), [5, 4])
+
+        await self.server._command(
+            b'history all before 4 limit 2', self.session_id1
+        )
+        self.assertEqual(self._history_ids(), [3, 2])
+
+        await self.server._command(b'history all after 3', self.session_id1)
+        self.assertEqual(self._history_ids(), [4, 5])
+
+    async def test_command_history_private(self):
+        await self.server._command(
+            f'send {self.user2.name} first'.encode(), self.session_id1
+        )
+        await self.server._command(
+            f'send {self.user1.name} second'.encode(), self.session_id2
+        )
+        await self.server._command(b'send_all public', self.session_id1)
+        await self.server._command(
+            f'send {self.user2.name} third'.encode(), self.session_id1
+        )
+        self.writer_mock.reset_mock()
+
+        await self.server._command(
+            f'history {self.user2.name}'.encode(), self.session_id1
+        )
+        self.assertEqual(self._history_ids(), [4, 2, 1])
+
+        await self.server._command(
+            f'history {self.user1.name} after 1'.encode(), self.session_id2
+        )
+        self.assertEqual(self._history_ids(), [2, 4])
+
+    async def test_command_history_with_self(self):
+        await self.server._command(
+            f'send {self.user1.name} note'.encode(), self.session_id1
+        )
+        self.writer_mock.reset_mock()
+
+        await self.server._command(
+            f'history {self.user1.name}'.encode(), self.session_id1
+        )
+        self.assertEqual(self._history_ids(), [1])
@@ -17,12 +17,26 @@ class TestServerCommandLogin(unittest.IsolatedAsyncioTestCase):
         )
 
     async def test_command_login_no_tokens(self):
-        await self.server._command_login([], self.session_id)
-        self.writer_mock.write.assert_called_once_with(NO_LOGIN_TEXT.encode())
+        await self.server._command(b'login', self.session_id)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NO_LOGIN_TEXT}\n'.encode()
+        )
+
+    async def test_command_login_reserved_name(self):
+        for name in ('all', '__public__'):
+            self.writer_mock.reset_mock()
+            await self.server._command(
+                f'login {name}'.encode(), self.session_id
+            )
+            self.writer_mock.write.assert_called_once_with(
+                f'Login name is reserved: {name}\n'.encode()
+            )
+        self.assertEqual(self.server.users, {})
+        self.assertIsNone(self.server._sessions[self.session_id].user_name)
 
     async def test_command_login_user_already_exists(self):
         self.server.users = {'user1': MagicMock()}
-        await self.server._command_login(['user1'], self.session_id)
+        await self.server._command(b'login user1', self.session_id)
         self.assertTrue(self.server.users['user1'].session)
         self.assertEqual(self.server.users['user1'].session, self.session_id)
         self.assertEqual(
@@ -31,7 +45,7 @@ class TestServerCommandLogin(unittest.IsolatedAsyncioTestCase):
 
     async def test_command_login_user_not_already_exists(self):
         self.server.users = {}
-        await self.server._command_login(['user1'], self.session_id)
+        await self.server._command(b'login user1', self.session_id)
         self.assertTrue(self.server.users['user1'])
         self.assertEqual(self.server.users['user1'].session, self.session_id)
         self.assertEqual(
@@ -39,5 +53,18 @@ class TestServerCommandLogin(unittest.IsolatedAsyncioTestCase):
         )
 
     async def test_is_login(self):
-        await self.server._command_login(['user1'], self.session_id)
+        await self.server._command(b'login user1', self.session_id)
         self.assertTrue(self.server._is_login(self.session_id))
+
+    async def test_command_login_ack(self):
+        await self.server._command(b'login:abc user1', self.session_id)
+        self.assertEqual(
+            self.server._sessions[self.session_id].user_name, 'user1'
+        )
+        self.writer_mock.write.assert_called_with(b'Ack: abc\n')
+
+    async def test_command_login_name_with_id_prefix(self):
+        await self.server._command(b'login id:bot', self.session_id)
+        self.assertEqual(
+            self.server._sessions[self.session_id].user_name, 'id:bot'
+        )
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock, patch
+
+from mailbox_store import MailboxStore
+from quotas import OVERFLOW_EVICT_OLDEST
+from server import Message, Server, User
+
+
+class TestServerMailbox(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = Server(mailbox_dir=self.tmp_dir.name)
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1', session=self.session_id1)
+        self.user2 = User(name='user2', exit_time=0)
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=MagicMock(spec=StreamWriter), user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=self.writer_mock, user_name=None
+        )
+
+    async def asyncTearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def _send(self, text: str) -> None:
+        await self.server._command(
+            f'send {self.user2.name} {text}'.encode(), self.session_id1
+        )
+
+    async def test_offline_message_stored_on_disk(self):
+        await self._send('first')
+        await self._send('second')
+        self.assertEqual(self.server.private_messages[self.user2.name], [])
+        self.assertTrue(self.server._mailbox.has_messages(self.user2.name))
+        self.assertEqual(self.server._memory.inbox_messages['user2'], 2)
+
+    async def test_login_delivers_mailbox(self):
+        await self._send('first')
+        await self._send('second')
+        await self.server._command(b'login user2', self.session_id2)
+
+        output = self.writer_mock.write.call_args.args[0].decode()
+        self.assertIn('Text: first', output)
+        self.assertIn('Text: second', output)
+        messages = self.server.private_messages[self.user2.name]
+        self.assertEqual([m.text for m in messages], ['first', 'second'])
+        self.assertTrue(all(m.read_time for m in messages))
+        self.assertFalse(self.server._mailbox.has_messages(self.user2.name))
+        self.assertEqual(len(self.server._search_index), 2)
+
+    async def test_evict_oldest_from_mailbox(self):
+        self.server._memory.overflow_policy = OVERFLOW_EVICT_OLDEST
+        self.server._memory.inbox_max_messages = 2
+        await self._send('first')
+        await self._send('second')
+        inode = os.stat(self.server._mailbox._path(self.user2.name)).st_ino
+        await self._send('third')
+        stored = list(self.server._mailbox.read(self.user2.name))
+        self.assertEqual([m.text for m in stored], ['second', 'third'])
+        self.assertEqual(
+            os.stat(self.server._mailbox._path(self.user2.name)).st_ino,
+            inode,
+        )
+
+    async def test_search_after_mailbox_delivery_and_expiry(self):
+        session_id3 = ('127.0.0.1', 12347)
+        self.server.users['user3'] = User(name='user3', session=session_id3)
+        self.server._sessions[session_id3] = MagicMock(
+            writer=MagicMock(spec=StreamWriter), user_name='user3'
+        )
+        await self._send('foo first')
+        await self.server._command(b'send user3 foo second', self.session_id1)
+        await self.server._command(b'login user2', self.session_id2)
+
+        messages = self.server.private_messages[self.user2.name]
+        expired = messages.pop(0)
+        self.server._forget_private_message(expired)
+
+        writer = self.server._sessions[self.session_id1].writer
+        await self.server._command(b'search foo', self.session_id1)
+        output = writer.write.call_args.args[0].decode()
+        self.assertEqual(output.split()[:2], ['Id:', '2'])
+        self.assertEqual(len(output.splitlines()), 1)
+
+
+    async def test_history_and_search_with_mailbox(self):
+        await self._send('hello world')
+        await self.server._command(b'send_all hello all', self.session_id1)
+        writer = self.server._sessions[self.session_id1].writer
+
+        await self.server._command(b'history user2', self.session_id1)
+        output = writer.write.call_args.args[0].decode()
+        self.assertEqual(len(output.splitlines()), 1)
+        self.assertIn('Text: hello world', output)
+
+        await self.server._command(b'search hello', self.session_id1)
+        output = writer.write.call_args.args[0].decode()
+        self.assertEqual(
+            [line.split()[1] for line in output.splitlines()], ['2', '1']
+        )
+        await self.server._command(b'search world', self.session_id1)
+        self.assertIn(
+            'Text: hello world', writer.write.call_args.args[0].decode()
+        )
+
+class TestMailboxStore(unittest.TestCase):
+    def test_broken_record_recovery(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mailbox = MailboxStore(tmp_dir)
+            first = Message(sender='a', recipient='b/c', text='1', create_at=0)
+            second = Message(sender='a', recipient='b/c', text='2', create_at=0)
+            mailbox.append(first)
+            with open(mailbox._path('b/c'), 'ab') as file:
+                file.write(b'\x00\x00\x01\x00broken')
+
+            self.assertEqual(list(mailbox.read('b/c')), [first])
+            mailbox._checked.clear()
+            mailbox.append(second)
+            self.assertEqual(list(mailbox.read('b/c')), [first, second])
+            self.assertEqual(mailbox.users(), ['b/c'])
+
+    def test_drop_head(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mailbox = MailboxStore(tmp_dir)
+            for text in ('1', '2', '3'):
+                mailbox.append(
+                    Message(sender='a', recipient='b', text=text, create_at=0)
+                )
+            path = mailbox._path('b')
+            size = os.path.getsize(path)
+
+            (first, end), _ = mailbox.head('b', 2)
+            self.assertEqual(first.text, '1')
+            mailbox.drop_head('b', end)
+            self.assertEqual([m.text for m in mailbox.read('b')], ['2', '3'])
+            self.assertEqual(os.path.getsize(path), size)
+
+            with patch('mailbox_store.COMPACT_MIN_BYTES', 0):
+                mailbox.drop_head('b', mailbox.head('b', 1)[0][1])
+            self.assertEqual([m.text for m in mailbox.read('b')], ['3'])
+            self.assertLess(os.path.getsize(path), size)
+
+            mailbox.drop_head('b', mailbox.head('b', 1)[0][1])
+            self.assertFalse(mailbox.has_messages('b'))
@@ -0,0 +1,99 @@
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from quotas import OVERFLOW_EVICT_OLDEST
+from server import Server, User
+
+MESSAGE_TOO_LARGE_WARNING = 'Message is too large (max 10 bytes)'
+INBOX_FULL_WARNING = 'Inbox of user2 is full'
+SENDER_QUOTA_WARNING = 'Sender quota exceeded'
+
+
+class TestServerQuotas(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server(
+            max_message_bytes=10,
+            inbox_max_messages=2,
+            inbox_max_bytes=15,
+            sender_max_bytes=100,
+            admins=['user1'],
+        )
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.user2 = User(name='user2')
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+
+    async def _send(self, text: str) -> None:
+        await self.server._command(
+            f'send {self.user2.name} {text}'.encode(), self.session_id1
+        )
+
+    def _inbox_texts(self) -> list[str]:
+        return [
+            message.text
+            for message in self.server.private_messages[self.user2.name]
+        ]
+
+    async def test_message_too_large(self):
+        await self._send('x' * 11)
+        self.writer_mock.write.assert_called_once_with(
+            f'{MESSAGE_TOO_LARGE_WARNING}\n'.encode()
+        )
+        self.writer_mock.reset_mock()
+        await self.server._command(
+            f"send_all {'x' * 11}".encode(), self.session_id1
+        )
+        self.writer_mock.write.assert_called_once_with(
+            f'{MESSAGE_TOO_LARGE_WARNING}\n'.encode()
+        )
+        self.assertEqual(self.server.public_messages, [])
+
+    async def test_inbox_count_evict_oldest(self):
+        self.server._memory.overflow_policy = OVERFLOW_EVICT_OLDEST
+        await self._send('first')
+        await self._send('second')
+        await self._send('third')
+        self.assertEqual(self._inbox_texts(), ['second', 'third'])
+
+    async def test_inbox_full_reject(self):
+        await self._send('first')
+        await self._send('second')
+        await self._send('third')
+        self.writer_mock.write.assert_called_once_with(
+            f'{INBOX_FULL_WARNING}\n'.encode()
+        )
+        self.assertEqual(self._inbox_texts(), ['first', 'second'])
+
+    async def test_inbox_bytes_evict_oldest(self):
+        self.server._memory.overflow_policy = OVERFLOW_EVICT_OLDEST
+        self.server._memory.inbox_max_messages = 10
+        await self._send('12345')
+        await self._send('123456')
+        await self._send('1234567')
+        self.assertEqual(self._inbox_texts(), ['123456', '1234567'])
+        self.assertEqual(self.server._memory.inbox_bytes['user2'], 13)
+        self.assertEqual(len(self.server._search_index), 2)
+
+    async def test_sender_quota(self):
+        self.server._memory.sender_max_bytes = 8
+        await self._send('12345')
+        await self._send('12345')
+        self.writer_mock.write.assert_called_once_with(
+            f'{SENDER_QUOTA_WARNING}\n'.encode()
+        )
+
+    async def test_command_memory(self):
+        await self._send('first')
+        self.writer_mock.reset_mock()
+        await self.server._command(b'memory', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            b'Private messages: 5 bytes\nuser2: 5 bytes, 1 messages\n'
+        )
@@ -0,0 +1,75 @@
+import unittest
+from asyncio.streams import StreamWriter
+from unittest.mock import MagicMock
+
+from server import Server, User
+
+NO_QUERY_WARNING = 'No search query'
+NO_MESSAGES_TEXT = 'No messages'
+
+
+class TestServerCommandSearch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = Server()
+        self.session_id1 = ('127.0.0.1', 12345)
+        self.session_id2 = ('127.0.0.1', 12346)
+        self.session_id3 = ('127.0.0.1', 12347)
+        self.writer_mock = MagicMock(spec=StreamWriter)
+        self.user1 = User(name='user1')
+        self.user2 = User(name='user2')
+        self.user3 = User(name='user3')
+        self.server.users = {
+            self.user1.name: self.user1,
+            self.user2.name: self.user2,
+            self.user3.name: self.user3,
+        }
+        self.server._sessions[self.session_id1] = MagicMock(
+            writer=self.writer_mock, user_name=self.user1.name
+        )
+        self.server._sessions[self.session_id2] = MagicMock(
+            writer=self.writer_mock, user_name=self.user2.name
+        )
+        self.server._sessions[self.session_id3] = MagicMock(
+            writer=self.writer_mock, user_name=self.user3.name
+        )
+
+        await self.server._command(b'send_all Hello world', self.session_id1)
+        await self.server._command(
+            f'send {self.user2.name} hello secret world'.encode(),
+            self.session_id1,
+        )
+        await self.server._command(b'send_all bye world', self.session_id2)
+        self.writer_mock.reset_mock()
+
+    def _search_ids(self) -> list[int]:
+        output = self.writer_mock.write.call_args.args[0].decode()
+        return [int(line.split()[1]) for line in output.splitlines()]
+
+    async def test_command_search_no_query(self):
+        await self.server._command(b'search', self.session_id1)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NO_QUERY_WARNING}\n'.encode()
+        )
+
+    async def test_command_search_sender_and_recipient(self):
+        await self.server._command(b'search HELLO world', self.session_id1)
+        self.assertEqual(self._search_ids(), [2, 1])
+        await self.server._command(b'search secret', self.session_id2)
+        self.assertEqual(self._search_ids(), [2])
+
+    async def test_command_search_private_not_visible(self):
+        await self.server._command(b'search world', self.session_id3)
+        self.assertEqual(self._search_ids(), [3, 1])
+        await self.server._command(b'search secret', self.session_id3)
+        self.writer_mock.write.assert_called_with(
+            f'{NO_MESSAGES_TEXT}\n'.encode()
+        )
+
+    async def test_search_index_remove(self):
+        message = self.server.private_messages[self.user2.name][0]
+        self.server._search_index.remove(message)
+        await self.server._command(b'search secret', self.session_id2)
+        self.writer_mock.write.assert_called_once_with(
+            f'{NO_MESSAGES_TEXT}\n'.encode()
+        )
+        self.assertEqual(len(self.server._search_index), 2)
@@ -31,12 +31,14 @@ class TestServerCommandSendAll(unittest.IsolatedAsyncioTestCase):
         )
 
     async def test_command_send_all_no_text(self):
-        await self.server._command_send_all([], self.session_id1)
+        await self.server._command(b'send_all', self.session_id1)
         self.writer_mock.write.assert_called_once_with(
-            NO_MESSAGE_TEXT.encode()
+            f'{NO_MESSAGE_TEXT}\n'.encode()
         )
 
     async def test_command_send_all(self):
-        await self.server._command_send_all([MESSAGE_TEXT], self.session_id1)
+        await self.server._command(
+            f'send_all {MESSAGE_TEXT}'.encode(), self.session_id1
+        )
         self.assertEqual(len(self.server.public_messages), 1)
         self.assertEqual(self.server.public_messages[0].text, MESSAGE_TEXT)